@@ -5,6 +5,9 @@
 import re
 import os
 import time
+import json
+import argparse
+import threading
 from datetime import datetime
 from collections import defaultdict, OrderedDict
 
@@ -15,6 +18,12 @@ from netmiko import ConnectHandler, NetMikoTimeoutException, NetMikoAuthenticati
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 
+from exporters import open_exporters, parse_formats, add_formats_arg
+from raw_archive import RawArchive
+from scheduler import AdaptiveScheduler, add_watch_args, new_down_events, new_event_interfaces
+from pipeline import run_pipeline, format_stats, add_pipeline_args
+from tracing import TRACER, span, add_profile_args, finish_tracing
+
 # ------------------------- CONFIG -------------------------
 NODES = [
     ("TNT-02ASR02_CI-02", "10.204.64.6"),
@@ -47,19 +56,31 @@ NODES = [
 
 # ==================== LOGIN ====================
 
-USERNAME = input("Enter username: ")
-PASSWORD = getpass("Enter password: ")
+# prompted for in the entrypoint so the parsers can be imported for offline re-analysis
+USERNAME = None
+PASSWORD = None
 
 DEVICE_TYPE = "cisco_xr"
 
 # Commands
 LOG_CMD = "show logging start today | i bfd | i BV"
-INT_DES_CMD_TEMPLATE = "show int {iface} des"
+INT_DES_CMD = "show interfaces description | i BV"
+# --snapshot: compact state tables first, then per-interface detail only for changed sessions
+SNAP_BFD_CMD = "show bfd session | i BV"
+SNAP_BGP_CMD = "show bgp vrf all summary"
+# by interface number: the BFD table says BV527, the logs BVI527 (| i takes a regex)
+IFACE_LOG_CMD = "show logging start today | i bfd | i BVI?{num}"
+IFACE_DES_CMD = "show interfaces description | i BVI?{num}"
 
 OUT_DIR = "outputs"
 EXCEL_FILE = os.path.join(OUT_DIR, "BFD_Status_Report.xlsx")
 TXT_FILE = os.path.join(OUT_DIR, "combined_report.txt")
 LOG_FILE = os.path.join(OUT_DIR, "run_log.txt")
+# per node BFD/BGP session state from the last --snapshot run
+SNAPSHOT_FILE = os.path.join(OUT_DIR, "bfd_snapshot.json")
+# flat exports (csv / jsonl / parquet) are written next to the Excel file: outputs/BFD_Status_Report.<ext>
+EXPORT_BASE = os.path.join(OUT_DIR, "BFD_Status_Report")
+EXPORT_COLUMNS = ["Node", "Company", "Interface", "IP", "Status", "Int Status", "Description", "Time"]
 
 os.makedirs(OUT_DIR, exist_ok=True)
 
@@ -72,6 +93,15 @@ RE_NEIGH = re.compile(r"neighbor\s+(\d+\.\d+\.\d+\.\d+)", re.IGNORECASE)
 RE_INTF = re.compile(r"interface\s+(BVI?\d+|BV\d+|BV\d+)", re.IGNORECASE)
 # time extraction
 RE_TIME = re.compile(r"\b[A-Za-z]{3}\s+\d{1,2}\s+(\d{2}:\d{2}:\d{2}(?:\.\d+)?)\b")
+# show bfd session:  BVI527  10.1.1.2  0s(0s*0)  900ms(300ms*3)  UP ...
+RE_BFD_SESSION = re.compile(r"^\s*(BVI?\d+)\s+(\d+\.\d+\.\d+\.\d+)\s.*?\b(UP|DOWN|INIT|ADMIN_?DOWN)\b", re.IGNORECASE)
+# show bgp summary:  Neighbor  Spk  AS  MsgRcvd  MsgSent  TblVer  InQ  OutQ  Up/Down  St/PfxRcd
+RE_BGP_NEIGH = re.compile(r"^(\d+\.\d+\.\d+\.\d+)\s+\d+\s+[\d.]+(?:\s+\d+){5}\s+(\S+)\s+(\S.*?)\s*$")
+# show bgp vrf all summary: every VRF's table follows a "VRF: <name>" header
+RE_BGP_VRF = re.compile(r"^VRF:\s*(\S+)")
+# Up/Down column: "00:12:34", "1d02h", "2w3d", "never"
+RE_UPTIME_PART = re.compile(r"(\d+)([ywdhms])")
+UPTIME_UNITS = {"y": 31536000, "w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
 
 # ------------------------- Company keywords -------------------------
 COMPANY_KEYWORDS = {
@@ -189,120 +219,392 @@ def parse_interface_description(output_text: str, iface: str):
             return (desc_col if desc_col else "NO_DESC_FOUND", "UNKNOWN")
     return ("NO_DESC_FOUND", "UNKNOWN")
 
-# ------------------------- Main processing -------------------------
-def process_all_nodes():
-    # Prepare aggregate structure for Excel: list of rows per node (we will expand rows)
-    report_per_node = OrderedDict()  # node -> dict(company -> list of dicts {iface, peer, status, desc, time}))
-    txt_report_blocks = []
+def parse_bv_descriptions(output_text: str):
+    """
+    Parse the whole 'show interfaces description | i BV' table in one pass:
+    returns dict: iface number -> (description, "Up"/"Down"/"UNKNOWN"), same rules as
+    parse_interface_description. Keyed by number because the logs say BVI527 and the table BV527.
+    """
+    table = {}
+    for line in output_text.splitlines():
+        parts = re.split(r"\s{2,}", line.strip())
+        m = re.match(r"^BVI?(\d+)$", parts[0], re.IGNORECASE)
+        if not m or len(parts) < 2:
+            continue
+        if len(parts) >= 3:
+            # [iface] [status] [protocol] [description (may be empty)]
+            status_col = parts[1].strip().lower()
+            proto_col = parts[2].strip().lower()
+            desc_col = parts[3].strip() if len(parts) >= 4 else ""
+            final_status = "Up" if status_col == "up" and proto_col == "up" else "Down"
+        else:
+            desc_col = parts[-1].strip()
+            final_status = "UNKNOWN"
+        table[m.group(1)] = (desc_col if desc_col else "NO_DESC_FOUND", final_status)
+    return table
 
-    for node_name, node_ip in tqdm(NODES, desc="Processing nodes", unit="node"):
-        log(f"Start node {node_name} {node_ip}")
-        node_entries = defaultdict(list)  # company -> list of entries
+# ------------------------- Main processing -------------------------
+def export_row(node_name, company, entry):
+    return {
+        "Node": node_name,
+        "Company": company,
+        "Interface": entry["iface"],
+        "IP": entry["peers"],
+        "Status": entry["log_state"],
+        "Int Status": entry["int_status"],
+        "Description": entry["desc"],
+        "Time": entry["time"],
+    }
+
+def error_block(node_name, exc):
+    """Log a failed node and return its text block for combined_report.txt."""
+    if isinstance(exc, NetMikoTimeoutException):
+        log(f"{node_name} - TIMEOUT: {exc}")
+        return f"{'-'*41}{node_name}{'-'*41}\nERROR: TIMEOUT connecting to node\n"
+    if isinstance(exc, NetMikoAuthenticationException):
+        log(f"{node_name} - AUTH_FAIL: {exc}")
+        return f"{'-'*41}{node_name}{'-'*41}\nERROR: AUTH failure\n"
+    log(f"{node_name} - ERROR: {exc}")
+    return f"{'-'*41}{node_name}{'-'*41}\nERROR: {exc}\n"
+
+def connect(node_name, node_ip):
+    log(f"Start node {node_name} {node_ip}")
+    device = {
+        "device_type": DEVICE_TYPE,
+        "host": node_ip,
+        "username": USERNAME,
+        "password": PASSWORD,
+        "port": 22,
+        "banner_timeout": 60,
+    }
+    with span("ssh_connect"):
+        return ConnectHandler(**device)
+
+def fetch_full(conn, node_name, archive):
+    """The whole day's BV logs, plus the BV description table when there are events."""
+    # 1) get filtered logs
+    with span("send_command"):
+        logs = conn.send_command(LOG_CMD, expect_string=r"#|>", delay_factor=2, max_loops=600, read_timeout=120)
+    archive.store(node_name, LOG_CMD, logs)
+    int_des = ""
+    if RE_STATE.search(logs):
+        # 2) descriptions of all BV interfaces in one go (only needed when there are events)
         try:
-            device = {
-                "device_type": DEVICE_TYPE,
-                "host": node_ip,
-                "username": USERNAME,
-                "password": PASSWORD,
-                "port": 22,
-                "banner_timeout": 60,
-            }
-            conn = ConnectHandler(**device)
-            # 1) get filtered logs
-            logs = conn.send_command(LOG_CMD, expect_string=r"#|>", delay_factor=2, max_loops=600, read_timeout=120)
-            # parse BV/BVI lines and last states
-            iface_map = parse_log_for_bv_entries(logs)
-            if not iface_map:
-                # no BVI/BV events
-                txt_report_blocks.append(f"{'-'*41}{node_name}{'-'*41}\nNo BGP Flapped / Down\n")
-                report_per_node[node_name] = node_entries
-                conn.disconnect()
-                
-                continue
-
-            # cache descriptions per iface
-            desc_cache = {}
-            status_from_desc = {}  # iface -> Up/Down/UNKNOWN (from show int ... des)
-            for iface in iface_map.keys():
-                cmd = INT_DES_CMD_TEMPLATE.format(iface=iface)
-                try:
-                    out = conn.send_command(cmd, expect_string=r"#|>", delay_factor=1, max_loops=200, read_timeout=60)
-                except Exception as e:
-                    out = ""
-                desc, int_status = parse_interface_description(out, iface)
-                desc_cache[iface] = desc
-                status_from_desc[iface] = int_status
-
-            # Now group by inferred company using desc_cache
-            for iface, info in iface_map.items():
-                desc = desc_cache.get(iface, "NO_DESC_FOUND")
-                company = classify_company(desc)
-                entry = {
-                    "iface": iface,
-                    "peers": info.get("peers", []),
-                    "log_state": info.get("last_state", "UNKNOWN"),   # UP/DOWN from logs last line
-                    "time": info.get("last_time", ""),
-                    "desc": desc,
-                    "int_status": status_from_desc.get(iface, "UNKNOWN"),  # Up/Down/UNKNOWN from show int ... des
-                }
-                node_entries[company].append(entry)
-
-            # Build text blocks similar to earlier format (one block per company per node)
-            for comp, entries in node_entries.items():
-                # build combined lists per company
-                ifaces_str = " , ".join(e["iface"] for e in entries)
-                peers_all = []
-                for e in entries:
-                    for p in e["peers"]:
-                        if p not in peers_all:
-                            peers_all.append(p)
-                peers_str = " , ".join(peers_all)
-                descs = " , ".join(e["desc"] for e in entries)
-                # pick alarm time as earliest (first) found time in entries (they are in log order)
-                alarm_time = entries[0]["time"] if entries and entries[0]["time"] else ""
-                # classification logic: if any last_state == DOWN and last occurrence is UP then FLAPPED; we use last_state logic:
-                last_states = [e["log_state"] for e in entries]
-                last_state = last_states[-1] if last_states else "UNKNOWN"
-                any_down = any(s == "DOWN" for s in last_states)
-                if last_state == "DOWN":
-                    classification = "BGP Down"
-                elif last_state == "UP" and any_down:
-                    classification = "BGP Flapped"
-                else:
-                    classification = "BGP Flapped"
-
-                block_lines = [
-                    f"{'-'*41}{node_name}{'-'*41}",
-                    f"Classification: {classification}",
-                    "Direction",
-                    f"{node_name}<> {descs}",
-                    f"Peers : {peers_str}" if peers_str else "Peers :",
-                    f"Interface : {ifaces_str}",
-                    # status placeholders will be in Excel; also include statuses from log (last_state) and int_status
-                    "Status : " + " , ".join(f"{{{e['iface']} : {e['log_state']}}}" for e in entries),
-                    "2nd line informed : No",
-                    f"Alarm time: {alarm_time}",
-                    ""
-                ]
-                txt_report_blocks.append("\n".join(block_lines))
-
-            report_per_node[node_name] = node_entries
-            conn.disconnect()
-        except NetMikoTimeoutException as e:
-            log(f"{node_name} - TIMEOUT: {e}")
-            txt_report_blocks.append(f"{'-'*41}{node_name}{'-'*41}\nERROR: TIMEOUT connecting to node\n")
-            report_per_node[node_name] = node_entries
-        except NetMikoAuthenticationException as e:
-            log(f"{node_name} - AUTH_FAIL: {e}")
-            txt_report_blocks.append(f"{'-'*41}{node_name}{'-'*41}\nERROR: AUTH failure\n")
-            report_per_node[node_name] = node_entries
+            with span("send_command"):
+                int_des = conn.send_command(INT_DES_CMD, expect_string=r"#|>", delay_factor=1, max_loops=200, read_timeout=60)
+            archive.store(node_name, INT_DES_CMD, int_des)
         except Exception as e:
-            log(f"{node_name} - ERROR: {e}")
-            txt_report_blocks.append(f"{'-'*41}{node_name}{'-'*41}\nERROR: {e}\n")
-            report_per_node[node_name] = node_entries
+            log(f"{node_name} - INT DES ERROR: {e}")
+    return {"logs": logs, "int_des": int_des}
+
+def fetch_node(node_name, node_ip, archive):
+    """
+    I/O stage: one SSH session per node, two commands. Returns the raw outputs
+    {"logs": LOG_CMD output, "int_des": INT_DES_CMD output}; raises on connection errors.
+    """
+    conn = connect(node_name, node_ip)
+    try:
+        return fetch_full(conn, node_name, archive)
+    finally:
+        conn.disconnect()
 
-        # delay between nodes
+def parse_node_tables(raw):
+    """
+    Regex part of parse_node: raw outputs -> (iface_map, desc_table)
+      iface_map:  BV/BVI lines and last states from the logs (parse_log_for_bv_entries)
+      desc_table: descriptions per iface number, BV527 in the table == BVI527 in the logs
+    """
+    with span("regex_parse"):
+        iface_map = parse_log_for_bv_entries(raw["logs"])
+        desc_table = parse_bv_descriptions(raw.get("int_des", ""))
+    return iface_map, desc_table
 
+def parse_node(node_name, raw, tables=None):
+    """
+    Parse stage (runs in a worker process): raw outputs -> (node_entries, txt_blocks)
+      node_entries: company -> list of entries for the Excel report
+      txt_blocks:   text blocks for combined_report.txt
+    tables is parse_node_tables(raw) when the caller already has it.
+    """
+    node_entries = defaultdict(list)  # company -> list of entries
+    blocks = []
+    iface_map, desc_table = tables or parse_node_tables(raw)
+    if not iface_map:
+        # no BVI/BV events
+        blocks.append(f"{'-'*41}{node_name}{'-'*41}\nNo BGP Flapped / Down\n")
+        return node_entries, blocks
+
+    # Now group by inferred company using the description table
+    for iface, info in iface_map.items():
+        desc, int_status = desc_table.get(re.sub(r"\D", "", iface), ("NO_DESC_FOUND", "UNKNOWN"))
+        with span("classify_company"):
+            company = classify_company(desc)
+        entry = {
+            "iface": iface,
+            "peers": info.get("peers", []),
+            "log_state": info.get("last_state", "UNKNOWN"),   # UP/DOWN from logs last line
+            "time": info.get("last_time", ""),
+            "desc": desc,
+            "int_status": int_status,  # Up/Down/UNKNOWN from show int des
+        }
+        node_entries[company].append(entry)
+
+    return node_entries, build_blocks(node_name, node_entries)
+
+def build_blocks(node_name, node_entries):
+    """Text blocks for combined_report.txt, one per company with entries on the node."""
+    blocks = []
+    # Build text blocks similar to earlier format (one block per company per node)
+    for comp, entries in node_entries.items():
+        # build combined lists per company
+        ifaces_str = " , ".join(e["iface"] for e in entries)
+        peers_all = []
+        for e in entries:
+            for p in e["peers"]:
+                if p not in peers_all:
+                    peers_all.append(p)
+        peers_str = " , ".join(peers_all)
+        descs = " , ".join(e["desc"] for e in entries)
+        # pick alarm time as earliest (first) found time in entries (they are in log order)
+        alarm_time = entries[0]["time"] if entries and entries[0]["time"] else ""
+        # classification logic: if any last_state == DOWN and last occurrence is UP then FLAPPED; we use last_state logic:
+        last_states = [e["log_state"] for e in entries]
+        last_state = last_states[-1] if last_states else "UNKNOWN"
+        any_down = any(s == "DOWN" for s in last_states)
+        if last_state == "DOWN":
+            classification = "BGP Down"
+        elif last_state == "UP" and any_down:
+            classification = "BGP Flapped"
+        else:
+            classification = "BGP Flapped"
+
+        block_lines = [
+            f"{'-'*41}{node_name}{'-'*41}",
+            f"Classification: {classification}",
+            "Direction",
+            f"{node_name}<> {descs}",
+            f"Peers : {peers_str}" if peers_str else "Peers :",
+            f"Interface : {ifaces_str}",
+            # status placeholders will be in Excel; also include statuses from log (last_state) and int_status
+            "Status : " + " , ".join(f"{{{e['iface']} : {e['log_state']}}}" for e in entries),
+            "2nd line informed : No",
+            f"Alarm time: {alarm_time}",
+            ""
+        ]
+        blocks.append("\n".join(block_lines))
+    return blocks
+
+def parse_node_item(node, raw):
+    # pipeline items are (node_name, node_ip) tuples; module level so it can be pickled
+    return parse_node(node[0], raw)
+
+def collect_node(node_name, node_ip, archive):
+    """
+    Fetch and parse one node in the calling thread (used by --watch).
+    Returns (node_entries, txt_blocks, logs); logs is None if the node could not be polled.
+    """
+    try:
+        raw = fetch_node(node_name, node_ip, archive)
+    except Exception as e:
+        return defaultdict(list), [error_block(node_name, e)], None
+    node_entries, blocks = parse_node(node_name, raw)
+    return node_entries, blocks, raw["logs"]
+
+# ------------------------- Snapshot mode -------------------------
+def uptime_seconds(text: str):
+    """BGP Up/Down column -> seconds (None for "never" or anything unknown)."""
+    if ":" in text:
+        try:
+            h, m, sec = (int(x) for x in text.split(":"))
+        except ValueError:
+            return None
+        return h * 3600 + m * 60 + sec
+    parts = RE_UPTIME_PART.findall(text)
+    return sum(int(n) * UPTIME_UNITS[u] for n, u in parts) if parts else None
+
+def parse_state_tables(bfd_text: str, bgp_text: str):
+    """
+    Join 'show bfd session' and 'show bgp vrf all summary' on the neighbor address:
+    returns dict: "iface|peer" -> {iface, peer, vrf, bfd: UP/DOWN/..., bgp: Established/Idle/... or None, up: seconds or None}
+    BGP neighbors are keyed by (vrf, peer). The BFD table has no VRF column, so a session
+    only gets BGP state when its peer address is used in a single VRF; customer VRFs that
+    reuse the same address leave bgp/up/vrf at None rather than pick the wrong neighbor.
+    """
+    bgp = {}    # (vrf, peer) -> {bgp, up}
+    vrfs = defaultdict(list)  # peer -> vrfs it appears in
+    vrf = None
+    for line in bgp_text.splitlines():
+        line = line.strip()
+        m_vrf = RE_BGP_VRF.match(line)
+        if m_vrf:
+            vrf = m_vrf.group(1)
+            continue
+        m = RE_BGP_NEIGH.match(line)
+        if m:
+            st = m.group(3)
+            bgp[(vrf, m.group(1))] = {"bgp": "Established" if st.isdigit() else st, "up": uptime_seconds(m.group(2))}
+            vrfs[m.group(1)].append(vrf)
+    sessions = {}
+    for line in bfd_text.splitlines():
+        m = RE_BFD_SESSION.match(line)
+        if not m:
+            continue
+        iface, peer = m.group(1), m.group(2)
+        peer_vrfs = vrfs.get(peer, [])
+        vrf = peer_vrfs[0] if len(peer_vrfs) == 1 else None
+        nb = bgp[(vrf, peer)] if len(peer_vrfs) == 1 else {}
+        sessions[f"{iface}|{peer}"] = {"iface": iface, "peer": peer, "vrf": vrf, "bfd": m.group(3).upper(),
+                                       "bgp": nb.get("bgp"), "up": nb.get("up")}
+    return sessions
+
+def session_up(s) -> bool:
+    return s["bfd"] == "UP" and s.get("bgp") in (None, "Established")
+
+def diff_sessions(prev: dict, cur: dict, elapsed: float):
+    """
+    Sessions that changed since the previous snapshot: key -> reason.
+    Neither table has a flap counter, so a BGP session whose Up/Down timer is
+    younger than the previous snapshot is counted as flapped in between.
+    """
+    changes = {}
+    for key, s in cur.items():
+        old = prev.get(key)
+        if old is None:
+            changes[key] = "new session"
+        elif s["bfd"] != old["bfd"]:
+            changes[key] = f"BFD {old['bfd']} -> {s['bfd']}"
+        elif s.get("bgp") != old.get("bgp"):
+            changes[key] = f"BGP {old.get('bgp')} -> {s.get('bgp')}"
+        elif s.get("up") is not None and s["up"] < elapsed:
+            changes[key] = f"BGP reset {s['up']}s ago"
+    for key in prev:
+        if key not in cur:
+            changes[key] = "session gone"
+    return changes
+
+def fetch_snapshot(node_name, node_ip, prev, archive):
+    """
+    I/O stage for --snapshot: the two state tables, then logs and description only for
+    interfaces with a changed session. prev is the node's entry from SNAPSHOT_FILE; without
+    one the node gets the full-day scan of fetch_node() as its baseline.
+    """
+    conn = connect(node_name, node_ip)
+    try:
+        with span("send_command"):
+            bfd = conn.send_command(SNAP_BFD_CMD, expect_string=r"#|>", delay_factor=1, max_loops=200, read_timeout=60)
+        archive.store(node_name, SNAP_BFD_CMD, bfd)
+        with span("send_command"):
+            bgp = conn.send_command(SNAP_BGP_CMD, expect_string=r"#|>", delay_factor=1, max_loops=200, read_timeout=60)
+        archive.store(node_name, SNAP_BGP_CMD, bgp)
+        with span("regex_parse"):
+            sessions = parse_state_tables(bfd, bgp)
+        if prev is None:
+            log(f"{node_name} - no previous snapshot, full scan")
+            raw = fetch_full(conn, node_name, archive)
+            raw.update(sessions=sessions, prev=None)
+            return raw
+
+        elapsed = (datetime.now() - datetime.fromisoformat(prev["taken"])).total_seconds()
+        changes = diff_sessions(prev["sessions"], sessions, elapsed)
+        details = {}
+        for key, reason in sorted(changes.items()):
+            log(f"{node_name} - {key}: {reason}")
+            iface = (sessions.get(key) or prev["sessions"][key])["iface"]
+            if iface in details:
+                continue
+            num = re.sub(r"\D", "", iface)
+            cmds = (IFACE_LOG_CMD.format(num=num), IFACE_DES_CMD.format(num=num))
+            outputs = []
+            for cmd in cmds:
+                with span("send_command"):
+                    out = conn.send_command(cmd, expect_string=r"#|>", delay_factor=1, max_loops=200, read_timeout=60)
+                archive.store(node_name, cmd, out)
+                outputs.append(out)
+            details[iface] = {"logs": outputs[0], "des": outputs[1]}
+    finally:
+        conn.disconnect()
+    return {"sessions": sessions, "prev": prev["sessions"], "changes": changes, "details": details}
+
+def parse_snapshot(node_name, raw):
+    """
+    Parse stage for --snapshot: -> (node_entries, txt_blocks, sessions).
+    The report has one entry per interface with a changed session or a session that is
+    still down; sessions keep their description and last event time for the next run.
+    """
+    sessions = raw["sessions"]
+    if raw["prev"] is None:
+        tables = parse_node_tables(raw)
+        node_entries, blocks = parse_node(node_name, raw, tables)
+        iface_map, desc_table = tables
+        by_num = {re.sub(r"\D", "", iface): info for iface, info in iface_map.items()}
+        for s in sessions.values():
+            num = re.sub(r"\D", "", s["iface"])
+            s["desc"], s["int_status"] = desc_table.get(num, ("NO_DESC_FOUND", "UNKNOWN"))
+            s["time"] = by_num.get(num, {}).get("last_time", "")
+        return node_entries, blocks, sessions
+
+    prev, changes, details = raw["prev"], raw["changes"], raw["details"]
+    # details of unchanged sessions carry over from the previous snapshot
+    for key, s in sessions.items():
+        for field in ("desc", "int_status", "time"):
+            s.setdefault(field, prev.get(key, {}).get(field, "NO_DESC_FOUND" if field == "desc" else ""))
+
+    per_iface = OrderedDict()  # iface -> sessions to report
+    for key in sorted(set(sessions) | set(changes)):
+        s = sessions.get(key) or dict(prev[key], bfd="GONE", bgp=None)
+        if key in changes or not session_up(s):
+            per_iface.setdefault(s["iface"], []).append(s)
+
+    node_entries = defaultdict(list)
+    for iface, group in per_iface.items():
+        detail = details.get(iface)
+        info = {}
+        desc, int_status = group[0]["desc"], group[0]["int_status"] or "UNKNOWN"
+        if detail:
+            num = re.sub(r"\D", "", iface)
+            with span("regex_parse"):
+                for log_iface, log_info in parse_log_for_bv_entries(detail["logs"]).items():
+                    if re.sub(r"\D", "", log_iface) == num:
+                        info = log_info
+                desc, int_status = parse_bv_descriptions(detail["des"]).get(num, (desc, int_status))
+        peers = list(info.get("peers", []))
+        for s in group:
+            if s["peer"] not in peers:
+                peers.append(s["peer"])
+            s["desc"], s["int_status"] = desc, int_status
+            s["time"] = info.get("last_time") or s["time"]
+        with span("classify_company"):
+            company = classify_company(desc)
+        node_entries[company].append({
+            "iface": iface,
+            "peers": peers,
+            "log_state": "UP" if all(session_up(s) for s in group) else "DOWN",
+            "time": group[0]["time"],
+            "desc": desc,
+            "int_status": int_status,
+        })
+
+    blocks = build_blocks(node_name, node_entries)
+    if not blocks:
+        blocks.append(f"{'-'*41}{node_name}{'-'*41}\nNo BGP Flapped / Down ({len(sessions)} sessions unchanged)\n")
+    return node_entries, blocks, sessions
+
+def parse_snapshot_item(node, raw):
+    return parse_snapshot(node[0], raw)
+
+def load_snapshot():
+    if not os.path.exists(SNAPSHOT_FILE):
+        return {}
+    with open(SNAPSHOT_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_snapshot(snapshot):
+    tmp = SNAPSHOT_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=1, sort_keys=True)
+    os.replace(tmp, SNAPSHOT_FILE)
+
+def write_text_report(txt_report_blocks):
     # write combined text file with header
     with open(TXT_FILE, "w", encoding="utf-8") as tf:
         tf.write("****************************************************************************\n")
@@ -312,10 +614,120 @@ def process_all_nodes():
         for b in txt_report_blocks:
             tf.write(b + "\n\n")
 
+def process_all_nodes(formats=None, archive=None, io_workers=1, parse_workers=None, queue_size=8, snapshot=False):
+    """
+    SSH (io_workers threads) -> parse_node (process pool) -> aggregation/exporters (this thread).
+    Reports keep the NODES order whatever order the nodes finish in.
+    snapshot=True diffs the BFD/BGP state tables against SNAPSHOT_FILE instead of
+    scanning the whole day's logs of every node (see fetch_snapshot).
+    """
+    formats = parse_formats(formats)
+    # every raw output is kept so parsers can be re-run offline (python raw_archive.py ls)
+    archive = archive or RawArchive()
+    # Prepare aggregate structure for Excel: list of rows per node (we will expand rows)
+    report_per_node = OrderedDict((n, defaultdict(list)) for n, _ in NODES)  # node -> dict(company -> list of entries)
+    blocks_per_node = OrderedDict((n, []) for n, _ in NODES)
+    # streaming exporters get each row as soon as its node is done; the styled workbook is built at the end
+    exporter = open_exporters(formats, EXPORT_BASE, EXPORT_COLUMNS, exclude=("xlsx",))
+    progress = tqdm(total=len(NODES), desc="Processing nodes", unit="node")
+    # nodes that fail keep their previous state so the next run still diffs against it
+    snap = load_snapshot() if snapshot else {}
+    prev_nodes = dict(snap.get("nodes", {}))
+    taken = datetime.now().isoformat(timespec="seconds")
+
+    def fetch(node):
+        node_name, node_ip = node
+        try:
+            if snapshot:
+                return fetch_snapshot(node_name, node_ip, prev_nodes.get(node_name), archive)
+            return fetch_node(node_name, node_ip, archive)
+        except Exception as e:
+            blocks_per_node[node_name] = [error_block(node_name, e)]
+            progress.update(1)
+            return None
+
+    def write(node, result):
+        node_name = node[0]
+        if snapshot:
+            node_entries, blocks, sessions = result
+            snap.setdefault("nodes", {})[node_name] = {"taken": taken, "sessions": sessions}
+        else:
+            node_entries, blocks = result
+        report_per_node[node_name] = node_entries
+        blocks_per_node[node_name] = blocks
+        for comp, entries in node_entries.items():
+            exporter.write_rows(export_row(node_name, comp, e) for e in entries)
+        progress.update(1)
+
+    def on_error(node, stage, exc):
+        blocks_per_node[node[0]] = [error_block(node[0], exc)]
+        progress.update(1)
+
+    stats = run_pipeline(NODES, fetch, parse_snapshot_item if snapshot else parse_node_item, write,
+                         io_workers=io_workers, parse_workers=parse_workers, queue_size=queue_size,
+                         on_error=on_error)
+    progress.close()
+    exporter.close()
+    archive.close()
+    log("Pipeline stats\n" + format_stats(stats))
+    if snapshot:
+        save_snapshot(snap)
+
+    with span("text_report"):
+        write_text_report([b for blocks in blocks_per_node.values() for b in blocks])
+
     # write excel file
-    write_excel(report_per_node)
+    outputs = list(exporter.paths)
+    if "xlsx" in formats:
+        with span("excel"):
+            write_excel(report_per_node)
+        outputs.insert(0, EXCEL_FILE)
 
-    print(f"Done. Excel: {EXCEL_FILE}  Text: {TXT_FILE}  Log: {LOG_FILE}")
+    print(format_stats(stats))
+    print(f"Done. Reports: {' , '.join(outputs)}  Text: {TXT_FILE}  Log: {LOG_FILE}")
+
+def watch_nodes(formats, min_interval, max_interval, concurrency):
+    """
+    --watch mode: poll nodes on adaptive intervals (see scheduler.py). Every poll appends
+    to the flat exports only the interfaces with log events newer than the previous poll;
+    the text report and Excel file reflect the latest poll of every node and are written
+    when the watch is stopped with Ctrl+C.
+    """
+    formats = parse_formats(formats)
+    archive = RawArchive()
+    node_ips = OrderedDict(NODES)
+    report_per_node = OrderedDict((n, defaultdict(list)) for n in node_ips)
+    blocks_per_node = OrderedDict((n, []) for n in node_ips)
+    last_seen = {}  # node -> newest log event already counted
+    exporter = open_exporters(formats, EXPORT_BASE, EXPORT_COLUMNS, append=True, exclude=("xlsx",))
+    lock = threading.Lock()
+
+    def poll(node_name):
+        node_entries, blocks, logs = collect_node(node_name, node_ips[node_name], archive)
+        if logs is None:
+            fresh, downs = set(), None
+        else:
+            fresh = new_event_interfaces(node_name, logs, last_seen)
+            downs = new_down_events(node_name, logs, last_seen)
+        with lock:
+            report_per_node[node_name] = node_entries
+            blocks_per_node[node_name] = blocks
+            for comp, entries in node_entries.items():
+                exporter.write_rows(export_row(node_name, comp, e) for e in entries if e["iface"] in fresh)
+        return downs
+
+    sched = AdaptiveScheduler(list(node_ips), poll, min_interval=min_interval, max_interval=max_interval,
+                              concurrency=concurrency, log_fn=log)
+    print(f"Watching {len(node_ips)} nodes (Ctrl+C to stop). Log: {LOG_FILE}")
+    polls = sched.run()
+    exporter.close()
+    archive.close()
+
+    write_text_report([b for blocks in blocks_per_node.values() for b in blocks])
+    if "xlsx" in formats:
+        write_excel(report_per_node)
+    print(sched.summary())
+    print(f"Done. {polls} polls. Text: {TXT_FILE}  Log: {LOG_FILE}")
 
 # ------------------------- Excel writer -------------------------
 def write_excel(report_per_node):
@@ -427,8 +839,32 @@ def write_excel(report_per_node):
     ws.freeze_panes = ws['B4']
 
     # final save
-    wb.save(EXCEL_FILE)
+    with span("openpyxl_save"):
+        wb.save(EXCEL_FILE)
 
 # ------------------------- Entrypoint -------------------------
+def parse_args():
+    ap = argparse.ArgumentParser(description="BFD/BGP status report for BV/BVI interfaces")
+    add_formats_arg(ap)
+    add_watch_args(ap)
+    add_pipeline_args(ap)
+    ap.add_argument("--snapshot", action="store_true",
+                    help=f"diff BFD/BGP session tables against {SNAPSHOT_FILE} and fetch logs only for changed sessions")
+    add_profile_args(ap)
+    args = ap.parse_args()
+    if args.snapshot and args.watch:
+        ap.error("--snapshot and --watch cannot be combined")
+    return args
+
 if __name__ == "__main__":
-    process_all_nodes()
+    args = parse_args()
+    if args.profile is not None:
+        TRACER.enable_profiling(args.profile, parent=OUT_DIR)
+    USERNAME = input("Enter username: ")
+    PASSWORD = getpass("Enter password: ")
+    if args.watch:
+        watch_nodes(args.formats, args.min_interval, args.max_interval, args.concurrency)
+    else:
+        process_all_nodes(args.formats, io_workers=args.io_workers, parse_workers=args.parse_workers,
+                          queue_size=args.queue_size, snapshot=args.snapshot)
+    finish_tracing()
@@ -4,10 +4,14 @@
 # ============================================
 # Imports
 # ============================================
-import time
-import re
+import argparse
 import pandas as pd
-from netmiko import ConnectHandler
+
+from exporters import open_exporters, add_formats_arg
+from raw_archive import RawArchive
+from pipeline import run_pipeline, format_stats, add_pipeline_args
+# parsing and per-node collection are shared with lr_database.py
+from lr_database import COLUMNS, fetch_lr_output, parse_node_output
 
 # ============================================
 # Nodes Information
@@ -23,98 +27,57 @@ nodes = [
     {"name": "RMD-01", "ip": "10.28.3.35"},
 ]
 
+# flat exports go to LR_Status_Report.<ext>
+EXPORT_BASE = "LR_Status_Report"
+OUTPUT_FILE = "LR_Status_Report.xlsx"
+
 # ============================================
 # SSH Credentials
 # ============================================
 username = "V25AGhany1"
 password = "Vodfone@1234"
 
-# ============================================
-# Regex pattern for parsing output lines
-# ============================================
-pattern = re.compile(
-    r"^(?P<interface>\S+)\s+(?P<state1>\S+)\s+(?P<state2>\S+)\s+(?P<desc>.+LR-(?P<lrnum>\d+))",
-    re.MULTILINE
-)
-
-# ============================================
-# Function to extract MTX-B
-# ============================================
-def extract_mtx_b(description):
-    first_part = description.split("\\")[0]
-    for prefix in ["HQ", "CA4", "CA5", "RMD", "BNS", "MNS", "ALX", "MKT", "TNT"]:
-        if prefix in first_part:
-            return prefix
-    return first_part
-
-# ============================================
-# Function to parse rate
-# ============================================
-def get_rate(interface):
-    if interface.startswith("Hu"):
-        return "100G"
-    elif interface.startswith("Te"):
-        return "10G"
-    else:
-        return "Unknown"
-
-# ============================================
-# Function to parse status
-# ============================================
-def get_status(state1, state2):
-    return "up" if state1 == "up" and state2 == "up" else "down"
-
 # ============================================
 # Connect to each node and collect data
 # ============================================
-results = []
-
-for node in nodes:
-    print(f"Connecting to {node['name']} ({node['ip']}) ...")
-    device = {
-        "device_type": "cisco_xr",
-        "ip": node["ip"],
-        "username": username,
-        "password": password,
-    }
-
-    try:
-        net_connect = ConnectHandler(**device)
-        output = net_connect.send_command("show int des | i LR")
-        net_connect.disconnect()
-
-        for match in pattern.finditer(output):
-            interface = match.group("interface")
-            state1 = match.group("state1")
-            state2 = match.group("state2")
-            desc = match.group("desc")
-            lrnum = match.group("lrnum")
-
-            mtx_b = extract_mtx_b(desc)
-            rate = get_rate(interface)
-            status = get_status(state1, state2)
-
-            results.append({
-                "MTX-A": node["name"],
-                "MTX-B": mtx_b,
-                "interface": interface,
-                "rate": rate,
-                "LR Number": int(lrnum),
-                "status": status
-            })
-
+def main():
+    ap = argparse.ArgumentParser(description="Collect LR interfaces from all nodes")
+    add_formats_arg(ap)
+    add_pipeline_args(ap)
+    args = ap.parse_args()
+    formats = args.formats
+
+    rows_per_node = {}
+    # streaming exporters get every LR row as soon as it is parsed
+    exporter = open_exporters(formats, EXPORT_BASE, COLUMNS, exclude=("xlsx",))
+    # raw outputs are archived for offline re-analysis (python raw_archive.py ls)
+    archive = RawArchive()
+
+    # SSH (--io-workers threads) -> parse_lr_output (process pool) -> exporters (this thread)
+    def write(node, rows):
+        rows_per_node[node["name"]] = rows
+        exporter.write_rows(rows)
         print(f"Data collected from {node['name']} successfully.\n")
 
-    except Exception as e:
-        print(f"Failed to connect to {node['name']} ({node['ip']}): {e}\n")
-
-    # Delay between nodes to avoid triggering security alerts
-    time.sleep(4)
-
-# ============================================
-# Create Excel file
-# ============================================
-df = pd.DataFrame(results, columns=["MTX-A", "MTX-B", "interface", "rate", "LR Number", "status"])
-output_file = "LR_Status_Report.xlsx"
-df.to_excel(output_file, index=False)
-print(f"\nExcel file '{output_file}' created successfully with {len(df)} entries.")
+    stats = run_pipeline(nodes, lambda node: fetch_lr_output(node, username, password, archive),
+                         parse_node_output, write, io_workers=args.io_workers,
+                         parse_workers=args.parse_workers, queue_size=args.queue_size)
+    print(format_stats(stats) + "\n")
+    results = [row for node in nodes for row in rows_per_node.get(node["name"], [])]
+
+    exporter.close()
+    archive.close()
+    for path in exporter.paths:
+        print(f"Export file '{path}' created with {exporter.rows_written} entries.")
+
+    # ============================================
+    # Create Excel file
+    # ============================================
+    if "xlsx" in formats:
+        df = pd.DataFrame(results, columns=COLUMNS)
+        output_file = OUTPUT_FILE
+        df.to_excel(output_file, index=False)
+        print(f"\nExcel file '{output_file}' created successfully with {len(df)} entries.")
+
+if __name__ == "__main__":
+    main()
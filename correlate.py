@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# correlate.py
+# Cross-node outage correlation: k-way time-ordered merge of per-node event streams,
+# clustered into incidents by LR number, node pair or site pair (--by), or by all three
+# at once (--by any: incidents that share any key are merged).
+# Pairs are unordered and node names are normalised to site + router number (node_id),
+# so both ends of an adjacency land in the same incident even when one side logs its
+# configured name (HQ-01) and the other its IS-IS hostname (HQ-01NewP02_CI-01).
+#
+# Usage:
+#   python correlate.py --since 2025-12-11                 # events from raw_archive (isis + bfd captures)
+#   python correlate.py HQ-01=LOGS.txt --by site --window 300
+#   python correlate.py --formats xlsx,jsonl               # Incidents.<ext>
+
+import argparse
+import heapq
+import os
+import re
+from datetime import datetime, timedelta
+
+from exporters import open_exporters, add_formats_arg
+from log_parsers import LR_CMD, parse_lr_output, short_ifname, parent_ifname, site_of, parse_events
+from raw_archive import RawArchive
+
+# ------------------------- CONFIG -------------------------
+DEFAULT_WINDOW = 120            # seconds of silence that close an incident
+GROUP_BY = ["lr", "remote", "site", "any"]
+# configured name / hostname -> node id, for routers node_id() cannot work out itself
+NODE_ALIASES = {}
+ISIS_CMD_FILTER = "| i isis"
+BFD_CMD_FILTER = "| i bfd"
+EXPORT_BASE = "Incidents"
+COLUMNS = ["Incident", "Group", "Key", "Start", "End", "Duration (s)", "Events", "Downs",
+           "Nodes", "Interfaces", "Remote", "LR", "Status"]
+
+# ------------------------- Regex -------------------------
+RE_PROMPT = re.compile(r"^RP/\S+?:(\S+?)#", re.MULTILINE)
+# IS-IS hostname: <site>-<site no.><model><n>_CI-<router no.>, e.g. ALX-05ASR01_CI-01
+RE_HOSTNAME_ID = re.compile(r"^([A-Za-z]+\d?)-\S*?_CI-(\d+)$", re.IGNORECASE)
+# configured (cpn_logs / lr_database) name: <site>-<router no.>, e.g. HQ-01
+RE_CONFIG_ID = re.compile(r"^([A-Za-z]+\d?)-(\d+)$")
+
+
+# ------------------------- Utility functions -------------------------
+def node_id(node: str) -> str:
+    """
+    Site + router number, the same for a router's configured name and its IS-IS hostname:
+    HQ-01NewP02_CI-02 -> HQ-02, HQ-02 -> HQ-02, ALX-05ASR01_CI-01 -> ALX-01.
+    NODE_ALIASES wins; anything else (BFD neighbor IPs) is returned as is.
+    """
+    node = node or ""
+    if node in NODE_ALIASES:
+        return NODE_ALIASES[node]
+    m = RE_HOSTNAME_ID.match(node) or RE_CONFIG_ID.match(node)
+    return f"{m.group(1).upper()}-{int(m.group(2)):02d}" if m else node
+
+def archive_streams(archive, since=None, until=None, nodes=None, lr_map=None):
+    """
+    One lazily-read event stream per node from the archived isis/bfd captures.
+    Successive captures of the same day overlap, so each capture only passes events
+    newer than the last event of the captures before it.
+    """
+    per_node = {}
+    for cmd_filter in (ISIS_CMD_FILTER, BFD_CMD_FILTER):
+        for e in archive.find(command=cmd_filter, since=since, until=until):
+            if nodes and e["node"] not in nodes:
+                continue
+            per_node.setdefault((e["node"], cmd_filter), []).append(e)
+
+    def stream(entries):
+        seen_until = None
+        for e in entries:
+            captured = datetime.fromisoformat(e["captured"])
+            last = seen_until
+            for ev in parse_events(e["node"], archive.read(e["digest"]), captured.year, captured):
+                if seen_until is not None and ev["time"] <= seen_until:
+                    continue
+                last = ev["time"]
+                yield annotate(ev, lr_map)
+            seen_until = last
+
+    return [stream(entries) for entries in per_node.values()]
+
+def file_stream(path: str, node: str = None, year: int = None, lr_map=None):
+    """Events from a pasted log file like LOGS.txt; node defaults to the prompt name, then the file name."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if not node:
+        m = RE_PROMPT.search(text)
+        node = m.group(1) if m else os.path.splitext(os.path.basename(path))[0]
+    year = year or datetime.fromtimestamp(os.path.getmtime(path)).year
+    for ev in parse_events(node, text, year):
+        yield annotate(ev, lr_map)
+
+def lr_map_from_archive(archive) -> dict:
+    """(node, short interface) -> LR number, from the latest LR capture of every node."""
+    lr_map = {}
+    for node in archive.nodes():
+        e = archive.latest(node, LR_CMD)
+        if e is None:
+            continue
+        for row in parse_lr_output(node, archive.read(e["digest"])):
+            lr_map[(node, row["interface"])] = row["LR Number"]
+    return lr_map
+
+def annotate(ev: dict, lr_map=None) -> dict:
+    """Add LR number (sub-interfaces fall back to their parent) and sites."""
+    lr = None
+    if lr_map:
+        iface = short_ifname(ev["interface"])
+        lr = lr_map.get((ev["node"], iface))
+        if lr is None:
+            lr = lr_map.get((ev["node"], parent_ifname(iface)))
+    ev["lr"] = lr
+    ev["site"] = site_of(ev["node"])
+    ev["remote_site"] = site_of(ev["remote"])
+    return ev
+
+
+# ------------------------- Merge + clustering -------------------------
+def merge_streams(streams):
+    """k-way merge of time-ordered per-node streams (heap based, one pending event per stream)."""
+    return heapq.merge(*streams, key=lambda ev: ev["time"])
+
+def _pair(a, b):
+    # unordered: HQ-01 -> ALX-05ASR01_CI-01 and ALX-05ASR01_CI-01 -> HQ-01 give the same key
+    return " <> ".join(sorted({a, b}))
+
+def _remote_key(ev):
+    if not ev["remote"]:
+        return ("remote", f"{node_id(ev['node'])}:{ev['interface']}")
+    return ("remote", _pair(node_id(ev["node"]), node_id(ev["remote"])))
+
+def _site_key(ev):
+    return ("site", _pair(ev["site"], ev["remote_site"] or ev["site"]))
+
+def cluster_keys(ev: dict, by: str) -> list:
+    """
+    lr     -> same LR number (falls back to the node pair when the interface has no LR)
+    remote -> same node pair: the node and its "Adjacency to ..." target / BFD neighbor
+    site   -> same site pair: the node's site and the far-end site
+    any    -> all of the above; an event joins (and merges) every incident sharing one
+    """
+    if by == "any":
+        keys = [("lr", f"LR-{ev['lr']}")] if ev.get("lr") is not None else []
+        return keys + [_remote_key(ev), _site_key(ev)]
+    if by == "lr" and ev.get("lr") is not None:
+        return [("lr", f"LR-{ev['lr']}")]
+    if by in ("lr", "remote"):
+        return [_remote_key(ev)]
+    return [_site_key(ev)]
+
+def _new_incident(ev):
+    return {
+        "keys": set(), "start": ev["time"], "end": ev["time"],
+        "events": 0, "downs": 0, "nodes": set(), "remotes": set(), "lrs": set(),
+        "last_state": {},   # (node, interface) -> last Up/Down seen
+    }
+
+def _merge_incident(inc, other):
+    """Fold `other` into `inc` (--by any, when one event links two open incidents)."""
+    later = other["end"] > inc["end"]
+    inc["keys"] |= other["keys"]
+    inc["start"] = min(inc["start"], other["start"])
+    inc["end"] = max(inc["end"], other["end"])
+    inc["events"] += other["events"]
+    inc["downs"] += other["downs"]
+    inc["nodes"] |= other["nodes"]
+    inc["remotes"] |= other["remotes"]
+    inc["lrs"] |= other["lrs"]
+    for k, state in other["last_state"].items():
+        if later or k not in inc["last_state"]:
+            inc["last_state"][k] = state
+
+def _add_event(inc, ev):
+    inc["end"] = ev["time"]
+    inc["events"] += 1
+    if ev["state"] == "Down":
+        inc["downs"] += 1
+    inc["nodes"].add(ev["node"])
+    if ev["remote"]:
+        inc["remotes"].add(ev["remote"])
+    if ev.get("lr") is not None:
+        inc["lrs"].add(ev["lr"])
+    inc["last_state"][(ev["node"], ev["interface"])] = ev["state"]
+
+def _incident_row(n, inc):
+    still_down = sorted(f"{n_}:{i}" for (n_, i), s in inc["last_state"].items() if s == "Down")
+    # widest key first: a site pair covers its node pairs, a node pair its LRs
+    keys = sorted(inc["keys"], key=lambda k: (-GROUP_BY.index(k[0]), k[1]))
+    return {
+        "Incident": n,
+        "Group": "+".join(dict.fromkeys(k[0] for k in keys)),
+        "Key": ", ".join(k[1] for k in keys if k[0] == keys[0][0]),
+        "Start": inc["start"].strftime("%Y-%m-%d %H:%M:%S"),
+        "End": inc["end"].strftime("%Y-%m-%d %H:%M:%S"),
+        "Duration (s)": int((inc["end"] - inc["start"]).total_seconds()),
+        "Events": inc["events"],
+        "Downs": inc["downs"],
+        "Nodes": ", ".join(sorted(inc["nodes"])),
+        "Interfaces": ", ".join(sorted(f"{n_}:{i}" for n_, i in inc["last_state"])),
+        "Remote": ", ".join(sorted(inc["remotes"])),
+        "LR": ", ".join(f"LR-{lr}" for lr in sorted(inc["lrs"])),
+        "Status": "Down" if still_down else "Flapped",
+    }
+
+def correlate(events, window: int = DEFAULT_WINDOW, by: str = "lr"):
+    """
+    Stream time-ordered events into incidents. An incident stays open while
+    events with its key keep arriving less than `window` seconds apart, and is
+    yielded (as a report row) as soon as the merged stream moves past that gap.
+    Only open incidents are held in memory.
+    """
+    if by not in GROUP_BY:
+        raise ValueError(f"Unknown grouping '{by}' (choose from {', '.join(GROUP_BY)})")
+    gap = timedelta(seconds=window)
+    incidents = {}          # incident id -> open incident
+    by_key = {}             # key -> incident id
+    expiry = []             # heap of (end time, incident id); stale entries are skipped
+    next_id = count = 0
+
+    for ev in events:
+        # close everything that went quiet before this event
+        while expiry and expiry[0][0] < ev["time"] - gap:
+            end, inc_id = heapq.heappop(expiry)
+            inc = incidents.get(inc_id)
+            if inc is not None and inc["end"] == end:
+                del incidents[inc_id]
+                for key in inc["keys"]:
+                    del by_key[key]
+                count += 1
+                yield _incident_row(count, inc)
+
+        keys = cluster_keys(ev, by)
+        ids = sorted({by_key[k] for k in keys if k in by_key})
+        if ids:
+            inc_id = ids[0]
+            inc = incidents[inc_id]
+            for other_id in ids[1:]:
+                other = incidents.pop(other_id)
+                _merge_incident(inc, other)
+                for key in other["keys"]:
+                    by_key[key] = inc_id
+        else:
+            inc_id, next_id = next_id, next_id + 1
+            inc = incidents[inc_id] = _new_incident(ev)
+        for key in keys:
+            inc["keys"].add(key)
+            by_key[key] = inc_id
+        _add_event(inc, ev)
+        heapq.heappush(expiry, (inc["end"], inc_id))
+
+    for inc in sorted(incidents.values(), key=lambda i: i["end"]):
+        count += 1
+        yield _incident_row(count, inc)
+
+
+# ------------------------- CLI -------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Group ISIS/BFD events from all nodes into incidents")
+    ap.add_argument("files", nargs="*", help="log files as NODE=path or path (default: read raw_archive)")
+    ap.add_argument("--by", choices=GROUP_BY, default="lr",
+                    help="incident grouping: lr, remote (node pair), site (site pair), or any to merge "
+                         "incidents sharing an LR, node pair or site pair (default: lr)")
+    ap.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                    help=f"seconds of silence that close an incident (default: {DEFAULT_WINDOW})")
+    ap.add_argument("--since", help="ISO time, archive mode only")
+    ap.add_argument("--until", help="ISO time, archive mode only")
+    ap.add_argument("--year", type=int, help="year for file logs (default: file modification year)")
+    add_formats_arg(ap, default=None, help="also export incidents: xlsx, csv, jsonl, parquet")
+    args = ap.parse_args(argv)
+
+    with RawArchive() as archive:
+        lr_map = lr_map_from_archive(archive)
+        if args.files:
+            streams = []
+            for spec in args.files:
+                node, _, path = spec.rpartition("=")
+                streams.append(file_stream(path, node or None, args.year, lr_map))
+        else:
+            streams = archive_streams(archive, args.since, args.until, lr_map=lr_map)
+
+        exporter = open_exporters(args.formats, EXPORT_BASE, COLUMNS) if args.formats else None
+        try:
+            for row in correlate(merge_streams(streams), args.window, args.by):
+                print(f"#{row['Incident']:<4} {row['Start']} -> {row['End'][11:]}  {row['Status']:<7} "
+                      f"{row['Group']}={row['Key']}  events={row['Events']}  nodes={row['Nodes']}")
+                if exporter:
+                    exporter.write_row(row)
+        finally:
+            if exporter:
+                exporter.close()
+                for path in exporter.paths:
+                    print(f"DONE: {exporter.rows_written} incidents written to '{path}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,25 @@
 # -*- coding: utf-8 -*-
 
 import getpass
+import argparse
 from netmiko import ConnectHandler
 from datetime import datetime
 import pandas as pd
 import time
 import sys
+import threading
+from functools import partial
 import re
 import os
 
+from exporters import open_exporters, add_formats_arg
+from raw_archive import RawArchive
+import correlate
+from log_parsers import parse_events
+from scheduler import AdaptiveScheduler, add_watch_args, new_down_events, new_event_interfaces
+from pipeline import run_pipeline, format_stats, add_pipeline_args
+from tracing import TRACER, span, add_profile_args, finish_tracing
+
 # -----------------------
 # Edit nodes here if needed
 # -----------------------
@@ -24,6 +35,15 @@ nodes = [
     {"name": "RMD-02", "ip": "10.28.3.32"},
 ]
 
+OUTPUT_FILE = "Report.xlsx"
+SHEET_NAME = "CPN_Logs"
+# flat exports (csv / jsonl / parquet) go to CPN_Logs.<ext>
+EXPORT_BASE = "CPN_Logs"
+COLUMNS = ["MTX-A", "Interface", "Flapping Start", "Flapping End", "Number of Flaps", "Status"]
+# correlated outages across all nodes (see correlate.py)
+INCIDENT_SHEET = "CPN_Incidents"
+INCIDENT_EXPORT_BASE = "CPN_Incidents"
+
 def build_command(start_dt: datetime, end_dt: datetime) -> str:
     start_str = start_dt.strftime("%Y %b %d %H:%M:%S")
     end_str = end_dt.strftime("%Y %b %d %H:%M:%S")
@@ -33,6 +53,19 @@ def parse_logs(node_name, logs, year):
     """
     Parse raw logs and return structured data for Excel.
     """
+    with span("regex_parse"):
+        entries = _parse_adjchanges(node_name, logs)
+
+    # Sort entries by Flapping Start time (with year)
+    with span("sort"):
+        sorted_entries = sorted(
+            entries.values(),
+            key=lambda x: datetime.strptime(f"{year} {x['Flapping Start']}", "%Y %b %d %H:%M:%S")
+        )
+
+    return sorted_entries
+
+def _parse_adjchanges(node_name, logs):
     entries = {}
     for line in logs.splitlines():
         if "ADJCHANGE" not in line:
@@ -72,21 +105,132 @@ def parse_logs(node_name, logs, year):
     for k, v in entries.items():
         v["Number of Flaps"] = (v["count"] + 1) // 2
         del v["count"]
+    return entries
 
-    # Sort entries by Flapping Start time (with year)
-    sorted_entries = sorted(
-        entries.values(),
-        key=lambda x: datetime.strptime(f"{year} {x['Flapping Start']}", "%Y %b %d %H:%M:%S")
-    )
+def parse_node_logs(node, output, year):
+    # pipeline parse stage; module level so it can be pickled to the worker processes
+    return parse_logs(node["name"], output, year)
 
-    return sorted_entries
+def fetch_logs(node, username, password, cmd):
+    """Run cmd on one node and return its output, or None if the node could not be reached."""
+    host = node["ip"]
+    name = node["name"]
+    try:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connecting to {name} ({host})...")
+
+        device = {
+            "device_type": "cisco_xr",
+            "host": host,
+            "username": username,
+            "password": password,
+        }
+
+        with span("ssh_connect"):
+            conn = ConnectHandler(**device)
+        with span("send_command"):
+            output = conn.send_command(cmd, delay_factor=1, max_loops=500)
+        conn.disconnect()
+        return output
+
+    except Exception as e:
+        print(f"\nERROR connecting to {name} ({host}): {e}\n")
+        return None
+
+def write_excel(df, extra_sheets=()):
+    """Write df to the CPN_Logs sheet of Report.xlsx (plus any (sheet_name, df) in extra_sheets)."""
+    sheets = [(SHEET_NAME, df)] + list(extra_sheets)
+    names = " and ".join(f"'{name}'" for name, _ in sheets)
+
+    # Check if 'Report.xlsx' exists
+    output_file = OUTPUT_FILE
+    if os.path.exists(output_file):
+        # Load existing file
+        with span("openpyxl_save"), \
+                pd.ExcelWriter(output_file, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
+            for name, sheet_df in sheets:
+                sheet_df.to_excel(writer, sheet_name=name, index=False)
+        print(f"\nDONE: Sheets {names} updated in '{output_file}'\n")
+    else:
+        # Create new file with required sheets
+        with span("openpyxl_save"), pd.ExcelWriter(output_file, engine="openpyxl") as writer:
+            for name, sheet_df in sheets:
+                sheet_df.to_excel(writer, sheet_name=name, index=False)
+        print(f"\nDONE: File '{output_file}' created with sheets {names}\n")
+
+def watch(args, formats, username, password):
+    """
+    --watch mode: poll today's logs on adaptive per-node intervals (see scheduler.py).
+    Every poll appends to the flat exports only the interfaces with ADJCHANGE events newer
+    than the previous poll; the CPN_Logs sheet is written from the latest poll of every
+    node when the watch is stopped with Ctrl+C.
+    Run correlate.py over the raw archive for incidents.
+    """
+    archive = RawArchive()
+    exporter = open_exporters(formats, EXPORT_BASE, COLUMNS, append=True, exclude=("xlsx",))
+    by_name = {n["name"]: n for n in nodes}
+    latest = {}     # node -> rows from its last successful poll
+    last_seen = {}  # node -> newest log event already counted
+    lock = threading.Lock()
+
+    def poll(name):
+        now = datetime.now()
+        cmd = build_command(now.replace(hour=0, minute=0, second=0, microsecond=0), now)
+        output = fetch_logs(by_name[name], username, password, cmd)
+        if output is None:
+            return None
+        archive.store(name, cmd, output)
+        rows = parse_logs(name, output, now.year)
+        fresh = new_event_interfaces(name, output, last_seen, now.year)
+        downs = new_down_events(name, output, last_seen, now.year)
+        with lock:
+            latest[name] = rows
+            exporter.write_rows(row for row in rows if row["Interface"] in fresh)
+        return downs
+
+    sched = AdaptiveScheduler(list(by_name), poll, min_interval=args.min_interval,
+                              max_interval=args.max_interval, concurrency=args.concurrency)
+    print(f"Watching {len(by_name)} nodes (Ctrl+C to stop)\n")
+    polls = sched.run()
+    exporter.close()
+    archive.close()
+    print(sched.summary())
+    print(f"\nDONE: {polls} polls")
+
+    all_data = [row for name in by_name for row in latest.get(name, [])]
+    if all_data and "xlsx" in formats:
+        with span("dataframe"):
+            df = pd.DataFrame(all_data, columns=COLUMNS)
+        write_excel(df)
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Unified CPN log collector")
+    add_formats_arg(ap)
+    ap.add_argument("--group-by", choices=correlate.GROUP_BY, default="lr",
+                    help="how flaps from different nodes are grouped into incidents: lr, remote (node pair), "
+                         "site (site pair) or any of them (default: lr)")
+    ap.add_argument("--window", type=int, default=correlate.DEFAULT_WINDOW,
+                    help=f"seconds of silence that close an incident (default: {correlate.DEFAULT_WINDOW})")
+    add_watch_args(ap)
+    add_pipeline_args(ap)
+    add_profile_args(ap)
+    return ap.parse_args()
 
 def main():
+    args = parse_args()
+    formats = args.formats
     print("\nUnified CPN Log Collector → Report.xlsx → CPN_Logs\n")
 
     username = input("Username: ").strip()
     password = getpass.getpass("Password: ")
 
+    if args.profile is not None:
+        TRACER.enable_profiling(args.profile)
+
+    if args.watch:
+        watch(args, formats, username, password)
+        finish_tracing()
+        return
+
     # date input
     date_in = input("Date (YYYY-MM-DD): ").strip()
     try:
@@ -105,58 +249,65 @@ def main():
         print("Invalid time format.")
         sys.exit(1)
 
-    all_data = []
-
-    for node in nodes:
-        host = node["ip"]
-        name = node["name"]
+    rows_per_node = {}
+    # streaming exporters get each node's rows as soon as they are parsed
+    exporter = open_exporters(formats, EXPORT_BASE, COLUMNS, exclude=("xlsx",))
+    # raw outputs are archived so parse_logs can be re-run offline (python raw_archive.py ls)
+    archive = RawArchive()
+    captures = []
+    cmd = build_command(start_dt, end_dt)
 
-        try:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Connecting to {name} ({host})...")
-
-            device = {
-                "device_type": "cisco_xr",
-                "host": host,
-                "username": username,
-                "password": password,
-            }
-
-            conn = ConnectHandler(**device)
-            cmd = build_command(start_dt, end_dt)
-            output = conn.send_command(cmd, delay_factor=1, max_loops=500)
-            conn.disconnect()
+    # SSH (--io-workers threads) -> parse_logs (process pool) -> exporters (this thread)
+    def fetch(node):
+        output = fetch_logs(node, username, password, cmd)
+        if output is not None:
+            captures.append(archive.store(node["name"], cmd, output))
+        time.sleep(1)
+        return output
 
-            node_data = parse_logs(name, output, day.year)
-            all_data.extend(node_data)
+    def write(node, node_data):
+        rows_per_node[node["name"]] = node_data
+        exporter.write_rows(node_data)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Logs processed for {node['name']}.")
 
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Logs processed for {name}.")
+    stats = run_pipeline(nodes, fetch, partial(parse_node_logs, year=day.year), write,
+                         io_workers=args.io_workers, parse_workers=args.parse_workers,
+                         queue_size=args.queue_size)
+    print("\n" + format_stats(stats) + "\n")
+    # keep the node order of the list above whatever order the nodes finished in
+    all_data = [row for node in nodes for row in rows_per_node.get(node["name"], [])]
 
-        except Exception as e:
-            print(f"\nERROR connecting to {name} ({host}): {e}\n")
+    exporter.close()
+    for path in exporter.paths:
+        print(f"DONE: {exporter.rows_written} rows written to '{path}'")
 
-        time.sleep(1)
+    # merge all nodes' events by time and group them into incidents
+    lr_map = correlate.lr_map_from_archive(archive)
+    streams = [
+        (correlate.annotate(ev, lr_map) for ev in parse_events(e["node"], archive.read(e["digest"]), day.year))
+        for e in captures
+    ]
+    incidents = []
+    with span("correlate"), \
+            open_exporters(formats, INCIDENT_EXPORT_BASE, correlate.COLUMNS, exclude=("xlsx",)) as inc_exporter:
+        for row in correlate.correlate(correlate.merge_streams(streams), args.window, args.group_by):
+            incidents.append(row)
+            inc_exporter.write_row(row)
+    archive.close()
+    print(f"DONE: {len(incidents)} incidents correlated across {len(captures)} nodes")
 
     if not all_data:
         print("No log entries found for the given date/time range.")
+        finish_tracing()
         sys.exit(0)
 
-    # Create DataFrame
-    df = pd.DataFrame(all_data, columns=[
-        "MTX-A", "Interface", "Flapping Start", "Flapping End", "Number of Flaps", "Status"
-    ])
-
-    # Check if 'Report.xlsx' exists
-    output_file = "Report.xlsx"
-    if os.path.exists(output_file):
-        # Load existing file
-        with pd.ExcelWriter(output_file, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-            df.to_excel(writer, sheet_name="CPN_Logs", index=False)
-        print(f"\nDONE: Sheet 'CPN_Logs' updated in '{output_file}'\n")
-    else:
-        # Create new file with required sheet
-        with pd.ExcelWriter(output_file, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name="CPN_Logs", index=False)
-        print(f"\nDONE: File '{output_file}' created with sheet 'CPN_Logs'\n")
+    if "xlsx" in formats:
+        # Create DataFrames
+        with span("dataframe"):
+            df = pd.DataFrame(all_data, columns=COLUMNS)
+            df_inc = pd.DataFrame(incidents, columns=correlate.COLUMNS)
+        write_excel(df, [(INCIDENT_SHEET, df_inc)])
+    finish_tracing()
 
 if __name__ == "__main__":
     main()
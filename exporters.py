@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# exporters.py
+# Streaming report exporters shared by BGP.py, cpn_logs.py, lr_database.py and LR_Checker.py
+# Requirements: openpyxl (xlsx), pyarrow (parquet) - csv / jsonl need nothing extra
+
+import argparse
+import csv
+import json
+import os
+from datetime import datetime
+
+# ------------------------- CONFIG -------------------------
+DEFAULT_FORMATS = ["xlsx"]
+# rows buffered in memory before a parquet row group is flushed
+PARQUET_BATCH_ROWS = 5000
+
+
+# ------------------------- Base exporter -------------------------
+class Exporter:
+    """
+    One output file. Rows are plain dicts keyed by `columns`; csv / jsonl are
+    flushed to disk once per write_rows() batch (one node) and on close(),
+    parquet every PARQUET_BATCH_ROWS. Use as a context manager so the file is
+    always closed.
+    """
+    extension = ""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        self.rows_written = 0
+
+    def write_row(self, row: dict):
+        raise NotImplementedError
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+        self.flush()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvExporter(Exporter):
+    extension = "csv"
+
+    def __init__(self, path, columns, append=False):
+        super().__init__(path, columns)
+        new_file = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self._fh = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._fh, fieldnames=self.columns, extrasaction="ignore")
+        if new_file:
+            self._writer.writeheader()
+
+    def write_row(self, row: dict):
+        self._writer.writerow({k: _flat(v) for k, v in row.items()})
+        self.rows_written += 1
+
+    def flush(self):
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+class JsonlExporter(Exporter):
+    extension = "jsonl"
+
+    def __init__(self, path, columns, append=False):
+        super().__init__(path, columns)
+        self._fh = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write_row(self, row: dict):
+        rec = {c: row.get(c) for c in self.columns}
+        self._fh.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+        self.rows_written += 1
+
+    def flush(self):
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+class ParquetExporter(Exporter):
+    """
+    Parquet files cannot be appended to: with append=True and an existing file
+    a new part file <base>-<YYYYmmdd-HHMMSS>.parquet is written next to it, so
+    restarting --watch keeps the earlier history (read <base>*.parquet together).
+    Rows go out in row groups of PARQUET_BATCH_ROWS.
+    All columns are stored as strings so rows from different nodes never clash on type.
+    """
+    extension = "parquet"
+
+    def __init__(self, path, columns, append=False):
+        if append and os.path.exists(path):
+            stem, ext = os.path.splitext(path)
+            path = f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S')}{ext}"
+        super().__init__(path, columns)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._schema = pa.schema([(c, pa.string()) for c in self.columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch = []
+
+    def write_row(self, row: dict):
+        self._batch.append(row)
+        self.rows_written += 1
+        if len(self._batch) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        data = {c: [None if r.get(c) is None else str(_flat(r.get(c))) for r in self._batch] for c in self.columns}
+        self._writer.write_table(self._pa.Table.from_pydict(data, schema=self._schema))
+        self._batch = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+class XlsxExporter(Exporter):
+    """
+    Flat one-sheet workbook written with openpyxl's write-only mode.
+    The workbook is only valid once close() has been called.
+    """
+    extension = "xlsx"
+
+    def __init__(self, path, columns, append=False, sheet_name="Report"):
+        super().__init__(path, columns)
+        from openpyxl import Workbook
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(title=sheet_name)
+        self._ws.append(self.columns)
+
+    def write_row(self, row: dict):
+        self._ws.append([_flat(row.get(c)) for c in self.columns])
+        self.rows_written += 1
+
+    def close(self):
+        self._wb.save(self.path)
+
+
+EXPORTERS = {
+    "csv": CsvExporter,
+    "jsonl": JsonlExporter,
+    "parquet": ParquetExporter,
+    "xlsx": XlsxExporter,
+}
+
+
+# ------------------------- Fan-out -------------------------
+class MultiExporter(Exporter):
+    """Writes every row to several exporters (one per selected format)."""
+
+    def __init__(self, exporters):
+        self.exporters = list(exporters)
+        self.columns = self.exporters[0].columns if self.exporters else []
+        self.rows_written = 0
+
+    @property
+    def paths(self):
+        return [e.path for e in self.exporters]
+
+    def write_row(self, row: dict):
+        for e in self.exporters:
+            e.write_row(row)
+        self.rows_written += 1
+
+    def flush(self):
+        for e in self.exporters:
+            e.flush()
+
+    def close(self):
+        for e in self.exporters:
+            e.close()
+
+
+# ------------------------- Utility functions -------------------------
+def _flat(value):
+    # lists (e.g. BGP peers) become "a, b" like the Excel report
+    if isinstance(value, (list, tuple, set)):
+        return ", ".join(str(v) for v in value)
+    return value
+
+
+def parse_formats(text) -> list:
+    """
+    "xlsx,csv" / ["csv", "jsonl"] -> ["xlsx", "csv"]. Unknown formats raise ValueError.
+    Empty input gives DEFAULT_FORMATS.
+    """
+    if not text:
+        return list(DEFAULT_FORMATS)
+    if isinstance(text, str):
+        text = text.split(",")
+    formats = []
+    for f in text:
+        f = f.strip().lower().lstrip(".")
+        if not f:
+            continue
+        if f not in EXPORTERS:
+            raise ValueError(f"Unknown output format '{f}' (choose from {', '.join(EXPORTERS)})")
+        if f not in formats:
+            formats.append(f)
+    return formats or list(DEFAULT_FORMATS)
+
+
+def formats_arg(text) -> list:
+    """argparse type for --formats, so a bad format fails before any prompt or SSH."""
+    try:
+        return parse_formats(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def add_formats_arg(ap, default="xlsx", help=None):
+    """Shared --formats option for the collectors."""
+    ap.add_argument("--formats", type=formats_arg, default=default,
+                    help=help or "comma separated output formats: xlsx, csv, jsonl, parquet (default: xlsx)")
+
+
+def open_exporters(formats, base_path, columns, append=False, exclude=()):
+    """
+    Open one exporter per format as <base_path>.<ext> and return a MultiExporter.
+    Scripts that keep their own styled workbook pass exclude=("xlsx",).
+    """
+    opened = []
+    try:
+        for f in parse_formats(formats):
+            if f in exclude:
+                continue
+            cls = EXPORTERS[f]
+            opened.append(cls(f"{base_path}.{cls.extension}", columns, append=append))
+    except Exception:
+        for e in opened:
+            e.close()
+        raise
+    return MultiExporter(opened)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# log_parsers.py
+# Parsers for captured IOS-XR command output, shared by the collectors, correlate.py,
+# scheduler.py and lr_index.py (stdlib only, so the watch scheduler and the LR index
+# load without pandas / netmiko)
+#
+#   parse_events     ISIS ADJCHANGE / BFD SESSION_STATE log lines -> event dicts
+#   parse_lr_output  "show int des | i LR" -> LR rows
+
+import re
+from datetime import datetime, timedelta
+
+from tracing import span
+
+# ------------------------- CONFIG -------------------------
+LR_CMD = "show int des | i LR"
+
+# ------------------------- Regex -------------------------
+RE_LOG_TIME = re.compile(r"\b([A-Z][a-z]{2})\s+(\d{1,2})\s+(\d{2}:\d{2}:\d{2})(\.\d+)?\b")
+# %ROUTING-ISIS-5-ADJCHANGE : Adjacency to ALX-05ASR01_CI-01 (TenGigE0/1/1/0.115) (L2) Down, Neighbor forgot us
+RE_ADJ = re.compile(r"ADJCHANGE\s*:\s*Adjacency to\s+(\S+)\s+\(([^)]+)\).*?\b(Up|Down)\b")
+RE_BFD_STATE = re.compile(r"SESSION_STATE_(UP|DOWN)", re.IGNORECASE)
+RE_BFD_NEIGH = re.compile(r"neighbor\s+(\d+\.\d+\.\d+\.\d+)", re.IGNORECASE)
+RE_BFD_INTF = re.compile(r"interface\s+(BVI?\d+)", re.IGNORECASE)
+# "show int des | i LR": Te0/0/0/0  up  up  HQ\ALX LR-299
+RE_LR_LINE = re.compile(
+    r"^(?P<interface>\S+)\s+(?P<state1>\S+)\s+(?P<state2>\S+)\s+(?P<desc>.+LR-(?P<lrnum>\d+))",
+    re.MULTILINE
+)
+RE_SITE = re.compile(r"^([A-Za-z]+\d?)-")
+
+
+# ------------------------- Names -------------------------
+def site_of(node: str) -> str:
+    """ALX-05ASR01_CI-01 -> ALX, CA4-01 -> CA4. Anything else is returned as is."""
+    m = RE_SITE.match(node or "")
+    return m.group(1).upper() if m else (node or "")
+
+
+# ------------------------- Interface names -------------------------
+# Logs say "TenGigE0/1/1/0.115", "show int des" says "Te0/1/1/0.115"
+IFNAME_ABBREV = [
+    ("HundredGigE", "Hu"),
+    ("FortyGigE", "Fo"),
+    ("TenGigE", "Te"),
+    ("GigabitEthernet", "Gi"),
+    ("Bundle-Ether", "BE"),
+]
+
+def short_ifname(interface):
+    for long_name, short in IFNAME_ABBREV:
+        if interface.startswith(long_name):
+            return short + interface[len(long_name):]
+    return interface
+
+def parent_ifname(interface):
+    # Te0/0/0/0.512 -> Te0/0/0/0
+    return interface.split(".", 1)[0]
+
+
+# ------------------------- LR descriptions -------------------------
+def extract_mtx_b(description):
+    first_part = description.split("\\")[0]
+    for prefix in ["HQ", "CA4", "CA5", "RMD", "BNS", "MNS", "ALX", "MKT", "TNT"]:
+        if prefix in first_part:
+            return prefix
+    return first_part
+
+def get_rate(interface):
+    if interface.startswith("Hu"):
+        return "100G"
+    elif interface.startswith("Te"):
+        return "10G"
+    else:
+        return "Unknown"
+
+def get_status(state1, state2):
+    return "up" if state1 == "up" and state2 == "up" else "down"
+
+def parse_lr_output(node_name, output):
+    with span("regex_parse"):
+        matches = list(RE_LR_LINE.finditer(output))
+    rows = []
+    for match in matches:
+        interface = match.group("interface")
+        state1 = match.group("state1")
+        state2 = match.group("state2")
+        desc = match.group("desc")
+        lrnum = match.group("lrnum")
+
+        mtx_b = extract_mtx_b(desc)
+        rate = get_rate(interface)
+        status = get_status(state1, state2)
+
+        rows.append({
+            "MTX-A": node_name,
+            "MTX-B": mtx_b,
+            "interface": interface,
+            "rate": rate,
+            "LR Number": int(lrnum),
+            "status": status
+        })
+    return rows
+
+
+# ------------------------- Logs -------------------------
+def _line_time(line: str, year: int, ref: datetime = None):
+    m = RE_LOG_TIME.search(line)
+    if not m:
+        return None
+    try:
+        t = datetime.strptime(f"{year} {m.group(1)} {m.group(2)} {m.group(3)}", "%Y %b %d %H:%M:%S")
+        if m.group(4):
+            t = t.replace(microsecond=int(m.group(4)[1:7].ljust(6, "0")))
+    except ValueError:
+        return None
+    # logs carry no year: a "Dec 31" line in a capture taken on Jan 1 belongs to the previous year
+    if ref and t - ref > timedelta(days=1):
+        t = t.replace(year=year - 1)
+    return t
+
+def parse_events(node: str, text: str, year: int, ref: datetime = None):
+    """
+    Yield one event dict per ISIS ADJCHANGE or BFD SESSION_STATE line, in log order:
+    { time, node, remote, interface, state ('Up'/'Down'), kind ('isis'/'bfd') }
+    BFD dampening lines are skipped like in BGP.py.
+    """
+    for line in text.splitlines():
+        if "ADJCHANGE" in line:
+            m = RE_ADJ.search(line)
+            if not m:
+                continue
+            t = _line_time(line, year, ref)
+            if t:
+                yield {"time": t, "node": node, "remote": m.group(1), "interface": m.group(2).strip(),
+                       "state": m.group(3), "kind": "isis"}
+        elif "SESSION_STATE" in line:
+            m_state = RE_BFD_STATE.search(line)
+            m_intf = RE_BFD_INTF.search(line)
+            if not m_state or not m_intf:
+                continue
+            t = _line_time(line, year, ref)
+            if t:
+                m_neigh = RE_BFD_NEIGH.search(line)
+                yield {"time": t, "node": node, "remote": m_neigh.group(1) if m_neigh else "",
+                       "interface": m_intf.group(1), "state": m_state.group(1).capitalize(), "kind": "bfd"}
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# lr_index.py
+# In-memory LR lookup index over the latest LR collection (no SSH needed)
+#
+# Built from the newest "show int des | i LR" capture of every node in raw_archive
+# (written by lr_database.py / LR_Checker.py), or from an LR_Database.<csv|jsonl> export.
+# When a new collection lands only the nodes that changed are re-indexed.
+#
+# Usage:
+#   python lr_index.py lr 299
+#   python lr_index.py pair HQ-01 ALX          (MTX-A may also be a site: HQ ALX)
+#   python lr_index.py iface Te0/0/0/0 [HQ-01]  (sub-interfaces are folded in)
+#   python lr_index.py status down
+#   python lr_index.py shell                   # interactive, refreshes before every query
+#   python lr_index.py serve --port 8765       # GET /lr/299 /pair/HQ-01/ALX /iface/Te0/0/0/0?node=HQ-01 /status/down /stats
+
+import argparse
+import csv
+import json
+import os
+import re
+import shlex
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+from log_parsers import LR_CMD, parse_lr_output, short_ifname, parent_ifname, site_of
+from raw_archive import RawArchive
+
+# ------------------------- CONFIG -------------------------
+DEFAULT_PORT = 8765
+REFRESH_SECONDS = 30     # serve: how often to look for new collections
+
+
+class LRIndex:
+    """
+    Records are the rows of parse_lr_output() plus a record id. Secondary indexes
+    map a key to a set of record ids:
+      lr      LR number                       -> records
+      pair    (MTX-A or its site, MTX-B or its site) -> records
+      iface   (node, interface) and interface  -> records (parent interface keys include sub-interfaces)
+      status  "up" / "down"                    -> records
+    """
+
+    def __init__(self):
+        self.records = {}                 # id -> row
+        self.by_node = defaultdict(set)   # node -> ids
+        self.keys = {}                    # id -> [(index name, key)] for removal
+        self.indexes = {name: defaultdict(set) for name in ("lr", "pair", "iface", "status")}
+        self.node_source = {}             # node -> ISO time of the collection its rows came from
+        self._next_id = 0
+        self._lock = threading.RLock()
+        self._archive_seen = 0            # archive entries already looked at
+        self._export_mtime = {}           # export path -> mtime loaded
+
+    # ---------- updates ----------
+    def _keys_for(self, row):
+        node = row["MTX-A"]
+        mtx_b = str(row["MTX-B"]).upper()
+        # MTX-B is the raw description prefix when no known site matched (e.g. "BS.ASR01")
+        m = re.match(r"[A-Z]+\d?", mtx_b)
+        b_site = m.group(0) if m else mtx_b
+        iface = short_ifname(row["interface"])
+        parent = parent_ifname(iface)
+        pairs = {(a, b) for a in (node.upper(), site_of(node)) for b in (mtx_b, b_site)}
+        keys = [("lr", int(row["LR Number"]))] + [("pair", p) for p in sorted(pairs)] + [
+            ("iface", (node.upper(), iface)),
+            ("iface", iface),
+            ("status", str(row["status"]).lower()),
+        ]
+        if parent != iface:
+            keys += [("iface", (node.upper(), parent)), ("iface", parent)]
+        return keys
+
+    def replace_node(self, node, rows, source=None):
+        """Swap in a node's new rows; records of all other nodes are untouched."""
+        with self._lock:
+            if source is not None and (self.node_source.get(node) or "") > source:
+                return False  # already have a newer collection for this node
+            for rid in self.by_node.pop(node, set()):
+                for name, key in self.keys.pop(rid):
+                    ids = self.indexes[name].get(key)
+                    if ids is not None:
+                        ids.discard(rid)
+                        if not ids:
+                            del self.indexes[name][key]
+                del self.records[rid]
+            for row in rows:
+                rid = self._next_id
+                self._next_id += 1
+                self.records[rid] = row
+                self.by_node[node].add(rid)
+                self.keys[rid] = self._keys_for(row)
+                for name, key in self.keys[rid]:
+                    self.indexes[name][key].add(rid)
+            self.node_source[node] = source
+            return True
+
+    def refresh_from_archive(self, archive) -> list:
+        """Re-index nodes with an LR capture newer than the one indexed. Returns the nodes updated."""
+        with self._lock:
+            archive.refresh()
+            latest = {}
+            for e in archive.entries[self._archive_seen:]:
+                if e["command"] == LR_CMD:
+                    latest[e["node"]] = e
+            self._archive_seen = len(archive.entries)
+            updated = []
+            for node, e in latest.items():
+                if self.node_source.get(node) == e["captured"]:
+                    continue
+                if self.replace_node(node, parse_lr_output(node, archive.read(e["digest"])), e["captured"]):
+                    updated.append(node)
+            return updated
+
+    def refresh_from_export(self, path) -> list:
+        """(Re)load an LR_Database.csv / .jsonl export if it changed since the last load."""
+        if not os.path.exists(path):
+            return []
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            if self._export_mtime.get(path) == mtime:
+                return []
+            per_node = defaultdict(list)
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                rows = (json.loads(l) for l in f if l.strip()) if path.endswith(".jsonl") else csv.DictReader(f)
+                for row in rows:
+                    per_node[row["MTX-A"]].append(row)
+            written = datetime.fromtimestamp(mtime).isoformat(timespec="seconds")
+            updated = [node for node, rows in per_node.items() if self.replace_node(node, rows, written)]
+            self._export_mtime[path] = mtime
+            return updated
+
+    # ---------- queries ----------
+    def _get(self, name, key):
+        with self._lock:
+            return [self.records[rid] for rid in sorted(self.indexes[name].get(key, ()))]
+
+    def by_lr(self, lr):
+        return self._get("lr", int(str(lr).upper().replace("LR-", "")))
+
+    def by_pair(self, mtx_a, mtx_b):
+        return self._get("pair", (mtx_a.upper(), mtx_b.upper()))
+
+    def by_iface(self, iface, node=None):
+        iface = short_ifname(iface)
+        return self._get("iface", (node.upper(), iface) if node else iface)
+
+    def by_status(self, status):
+        return self._get("status", status.lower())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "records": len(self.records),
+                "nodes": {n: self.node_source.get(n) for n in sorted(self.by_node)},
+                "lrs": len(self.indexes["lr"]),
+            }
+
+
+# ------------------------- Utility functions -------------------------
+def fold(rows):
+    """
+    Fold sub-interfaces into their parent: one line per (node, parent interface)
+    with status "up" only when the parent and every sub-interface are up.
+    """
+    folded = {}
+    for row in rows:
+        iface = short_ifname(row["interface"])
+        key = (row["MTX-A"], parent_ifname(iface))
+        f = folded.setdefault(key, {"MTX-A": row["MTX-A"], "MTX-B": row["MTX-B"], "interface": key[1],
+                                    "sub-interfaces": [], "rate": row["rate"], "LR": set(), "status": "up"})
+        if iface != key[1]:
+            f["sub-interfaces"].append(iface)
+        f["LR"].add(int(row["LR Number"]))
+        if str(row["status"]).lower() != "up":
+            f["status"] = "down"
+    out = []
+    for f in folded.values():
+        f["LR"] = ", ".join(f"LR-{n}" for n in sorted(f["LR"]))
+        out.append(f)
+    return out
+
+def run_query(index, words):
+    """words like ["lr", "299"] -> folded result rows. Raises ValueError on a bad query."""
+    if not words:
+        raise ValueError("empty query")
+    kind, args = words[0].lower(), words[1:]
+    if kind == "lr" and len(args) == 1:
+        rows = index.by_lr(args[0])
+    elif kind == "pair" and len(args) == 2:
+        rows = index.by_pair(*args)
+    elif kind == "iface" and len(args) in (1, 2):
+        rows = index.by_iface(*args)
+    elif kind == "status" and len(args) == 1:
+        rows = index.by_status(args[0])
+    else:
+        raise ValueError("queries: lr <n> | pair <MTX-A> <MTX-B> | iface <interface> [node] | status <up|down>")
+    return fold(rows)
+
+def print_rows(rows, elapsed_ms):
+    for f in rows:
+        subs = f" (+{', '.join(f['sub-interfaces'])})" if f["sub-interfaces"] else ""
+        print(f"{f['LR']:<10} {f['MTX-A']:<8} <> {f['MTX-B']:<6} {f['interface']}{subs}  {f['rate']}  {f['status']}")
+    print(f"{len(rows)} result(s) in {elapsed_ms:.3f} ms")
+
+def build_index(archive, export=None):
+    index = LRIndex()
+    if export:
+        index.refresh_from_export(export)
+    index.refresh_from_archive(archive)
+    return index
+
+
+# ------------------------- HTTP API -------------------------
+def serve(index, archive, port, export=None, refresh_seconds=REFRESH_SECONDS):
+    def refresher():
+        while True:
+            time.sleep(refresh_seconds)
+            updated = index.refresh_from_archive(archive)
+            if export:
+                updated += index.refresh_from_export(export)
+            if updated:
+                print(f"[{time.strftime('%H:%M:%S')}] re-indexed: {', '.join(updated)}")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+            if parts == ["stats"]:
+                return self._send(200, index.stats())
+            # interface names contain "/" so everything after /iface/ is the interface
+            if parts and parts[0] == "iface":
+                node = parse_qs(url.query).get("node", [None])[0]
+                parts = ["iface", "/".join(parts[1:])] + ([node] if node else [])
+            t0 = time.perf_counter()
+            try:
+                rows = run_query(index, parts)
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            self._send(200, {"results": rows, "elapsed_ms": (time.perf_counter() - t0) * 1000})
+
+        def _send(self, code, body):
+            data = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    threading.Thread(target=refresher, daemon=True).start()
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"LR index: {len(index.records)} records. Serving on http://127.0.0.1:{port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ------------------------- CLI -------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Look up LRs from the latest LR collection")
+    ap.add_argument("--export", help="also load an LR_Database.csv / .jsonl export")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"serve: port (default: {DEFAULT_PORT})")
+    ap.add_argument("query", nargs="+", help="lr <n> | pair <A> <B> | iface <if> [node] | status <s> | shell | serve")
+    args = ap.parse_args(argv)
+
+    with RawArchive() as archive:
+        index = build_index(archive, args.export)
+        if args.query[0] == "serve":
+            serve(index, archive, args.port, args.export)
+            return
+        if args.query[0] != "shell":
+            t0 = time.perf_counter()
+            try:
+                rows = run_query(index, args.query)
+            except ValueError as e:
+                ap.error(str(e))
+            print_rows(rows, (time.perf_counter() - t0) * 1000)
+            return
+        print(f"LR index: {len(index.records)} records from {len(index.by_node)} nodes. Empty line to quit.")
+        while True:
+            try:
+                line = input("lr> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                break
+            if not line:
+                break
+            updated = index.refresh_from_archive(archive)
+            if args.export:
+                updated += index.refresh_from_export(args.export)
+            if updated:
+                print(f"re-indexed: {', '.join(updated)}")
+            t0 = time.perf_counter()
+            try:
+                rows = run_query(index, shlex.split(line))
+            except ValueError as e:
+                print(e)
+                continue
+            print_rows(rows, (time.perf_counter() - t0) * 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# pipeline.py
+# I/O -> parse -> write pipeline shared by the collectors (stdlib only)
+#
+#   fetch  : io_workers threads run fetch_fn(item) (SSH) and put raw output on a bounded queue
+#   parse  : a process pool runs parse_fn(item, raw) (regex / CPU work) off the queue
+#   write  : the calling thread runs write_fn(item, result) (aggregation, exporters, Excel)
+#
+# Back-pressure: the raw queue holds at most queue_size outputs and only a few parses are
+# in flight per worker, so a slow writer stalls parsing and a slow parser stalls SSH.
+# parse_fn must be a module-level function (it is pickled to the worker processes, which
+# are spawned, not forked, so they never inherit the SSH threads' locks or sockets).
+# If a worker process dies the pool is broken: the lost items and everything after
+# them are parsed in this process instead.
+# Every stage runs under a tracing span (fetch / parse / write); spans opened inside the
+# worker processes are sent back with each result and merged into this process' tracer.
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from tracing import TRACER, span, init_worker, run_in_worker
+
+# ------------------------- CONFIG -------------------------
+IO_WORKERS = 1           # SSH sessions at once (the nodes' pacing delays stay per worker)
+QUEUE_SIZE = 8           # raw outputs waiting for a parser
+IN_FLIGHT_PER_WORKER = 2 # parses submitted but not yet written, per process
+STAGES = ("fetch", "parse", "write")
+
+_DONE = object()
+
+
+def add_pipeline_args(ap):
+    """Shared pipeline options for the collectors."""
+    ap.add_argument("--io-workers", type=int, default=IO_WORKERS,
+                    help=f"SSH sessions at the same time (default: {IO_WORKERS})")
+    ap.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1,
+                    help="parser processes, 0 parses in a thread of this process (default: CPU count)")
+    ap.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                    help=f"raw outputs buffered between SSH and parsing (default: {QUEUE_SIZE})")
+
+
+# ------------------------- Utility functions -------------------------
+def _size(raw) -> int:
+    if isinstance(raw, str):
+        return len(raw)
+    if isinstance(raw, dict):
+        return sum(_size(v) for v in raw.values())
+    if isinstance(raw, (list, tuple)):
+        return sum(_size(v) for v in raw)
+    return 0
+
+def format_stats(stats: dict) -> str:
+    """Per-stage table for the stats returned by run_pipeline()."""
+    wall = stats.get("wall", 0.0)
+    lines = [f"{'Stage':<8}{'Items':>7}{'Errors':>8}{'Busy(s)':>10}{'Items/s':>10}{'KB/s':>10}"]
+    for name in STAGES:
+        st = stats[name]
+        rate = st["items"] / wall if wall else 0.0
+        kbps = st["bytes"] / 1024 / wall if wall else 0.0
+        lines.append(f"{name:<8}{st['items']:>7}{st['errors']:>8}{st['busy']:>10.2f}{rate:>10.2f}{kbps:>10.1f}")
+    lines.append(f"wall time: {wall:.2f}s")
+    return "\n".join(lines)
+
+
+# ------------------------- Pipeline -------------------------
+def run_pipeline(items, fetch_fn, parse_fn, write_fn, io_workers=IO_WORKERS, parse_workers=None,
+                 queue_size=QUEUE_SIZE, on_error=None, log_fn=print):
+    """
+    Push every item through fetch -> parse -> write and return per-stage stats:
+    { stage: {items, errors, busy, bytes} , "wall": seconds }.
+    fetch_fn returning None skips the item (e.g. node unreachable, already reported by
+    fetch_fn) and counts as a fetch error.
+    Exceptions in any stage go to on_error(item, stage, exc) and the item is dropped.
+    """
+    if parse_workers is None:
+        parse_workers = os.cpu_count() or 1
+    on_error = on_error or (lambda item, stage, exc: log_fn(f"{item} - {stage.upper()} ERROR: {exc}"))
+    stats = {name: {"items": 0, "errors": 0, "busy": 0.0, "bytes": 0} for name in STAGES}
+    stats_lock = threading.Lock()
+    t_start = time.perf_counter()
+
+    def add(stage, seconds, nbytes=0, error=False):
+        with stats_lock:
+            st = stats[stage]
+            st["busy"] += seconds
+            st["bytes"] += nbytes
+            st["errors" if error else "items"] += 1
+
+    todo = queue.Queue()
+    for item in items:
+        todo.put(item)
+    raw_q = queue.Queue(maxsize=max(1, queue_size))
+    results_q = queue.Queue()
+    in_flight = threading.Semaphore(max(1, parse_workers) * IN_FLIGHT_PER_WORKER)
+
+    # ---------- fetch stage ----------
+    def io_worker():
+        while True:
+            try:
+                item = todo.get_nowait()
+            except queue.Empty:
+                return
+            t0 = time.perf_counter()
+            try:
+                with span("fetch"):
+                    raw = fetch_fn(item)
+            except Exception as e:
+                add("fetch", time.perf_counter() - t0, error=True)
+                on_error(item, "fetch", e)
+                continue
+            if raw is None:
+                add("fetch", time.perf_counter() - t0, error=True)
+                continue
+            add("fetch", time.perf_counter() - t0, _size(raw))
+            raw_q.put((item, raw))  # blocks while the parsers are behind
+
+    io_threads = [threading.Thread(target=io_worker, daemon=True) for _ in range(max(1, io_workers))]
+    for t in io_threads:
+        t.start()
+
+    def close_fetch():
+        for t in io_threads:
+            t.join()
+        raw_q.put(_DONE)
+
+    # ---------- parse stage ----------
+    pool = None
+    if parse_workers > 0:
+        pool = ProcessPoolExecutor(max_workers=parse_workers, initializer=init_worker,
+                                   initargs=(TRACER.profile_dir,),
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def parse_inline(item, raw):
+        t0 = time.perf_counter()
+        with span("parse"):
+            result = parse_fn(item, raw)
+        return result, time.perf_counter() - t0, None
+
+    def dispatcher():
+        submitted = 0
+        use_pool = pool is not None
+        try:
+            while True:
+                msg = raw_q.get()
+                if msg is _DONE:
+                    break
+                item, raw = msg
+                in_flight.acquire()  # released by the writer
+                fut = None
+                if use_pool:
+                    try:
+                        fut = pool.submit(run_in_worker, "parse", parse_fn, item, raw)
+                    except BrokenProcessPool as e:
+                        use_pool = False
+                        log_fn(f"PARSE: worker process died ({e}); parsing the remaining items in this process")
+                    except Exception as e:
+                        add("parse", 0.0, error=True)
+                        on_error(item, "parse", e)
+                        in_flight.release()
+                        continue
+                if fut is None:
+                    fut = Future()
+                    try:
+                        fut.set_result(parse_inline(item, raw))
+                    except Exception as e:
+                        fut.set_exception(e)
+                fut.add_done_callback(lambda f, item=item, raw=raw: results_q.put((item, raw, f)))
+                submitted += 1
+        finally:
+            # results can still arrive after this, so the writer counts up to `submitted`
+            results_q.put((_DONE, submitted, None))
+
+    threading.Thread(target=close_fetch, daemon=True).start()
+    threading.Thread(target=dispatcher, daemon=True).start()
+
+    # ---------- write stage (this thread) ----------
+    received = 0
+    expected = None
+    try:
+        while expected is None or received < expected:
+            item, raw, fut = results_q.get()
+            if item is _DONE:
+                expected = raw
+                continue
+            received += 1
+            try:
+                try:
+                    result, seconds, spans = fut.result()
+                except BrokenProcessPool:
+                    # its worker died (or another one did and took the pool down): parse it here
+                    result, seconds, spans = parse_inline(item, raw)
+                TRACER.merge(spans)
+                add("parse", seconds, _size(raw))
+            except Exception as e:
+                add("parse", 0.0, error=True)
+                on_error(item, "parse", e)
+                in_flight.release()
+                continue
+            t0 = time.perf_counter()
+            try:
+                with span("write"):
+                    write_fn(item, result)
+                add("write", time.perf_counter() - t0)
+            except Exception as e:
+                add("write", time.perf_counter() - t0, error=True)
+                on_error(item, "write", e)
+            finally:
+                in_flight.release()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    stats["wall"] = time.perf_counter() - t_start
+    return stats
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# raw_archive.py
+# Compressed, content-addressed archive of raw device output (stdlib only)
+#
+# Layout:
+#   raw_archive/packs/pack-YYYYMM.bin   append-only zlib blobs, one per distinct output
+#   raw_archive/index.jsonl             one line per capture: node, command, captured, digest, pack, offset, length
+#
+# Offline re-analysis example:
+#   from raw_archive import RawArchive
+#   from cpn_logs import parse_logs
+#   for entry, text in RawArchive().iter_outputs(command="| i isis", since="2025-12-01"):
+#       rows = parse_logs(entry["node"], text, 2025)
+
+import argparse
+import bisect
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# ------------------------- CONFIG -------------------------
+ARCHIVE_DIR = "raw_archive"
+INDEX_NAME = "index.jsonl"
+LOCK_NAME = ".lock"          # held by the writing process from refresh to index append
+PACK_DIR = "packs"
+COMPRESS_LEVEL = 6
+
+
+# ------------------------- Utility functions -------------------------
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock between processes (e.g. BGP.py --watch and cpn_logs.py --watch on one archive)."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class RawArchive:
+    """
+    Identical outputs (same sha256) are stored once; every capture still gets
+    its own index line so the history per (node, command) is complete.
+    Blobs are read back through mmap so re-parsing months of history never
+    loads whole pack files into memory.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, INDEX_NAME)
+        self.lock_path = os.path.join(root, LOCK_NAME)
+        self.pack_dir = os.path.join(root, PACK_DIR)
+        os.makedirs(self.pack_dir, exist_ok=True)
+        self.entries = []       # capture index, in file order
+        self.by_key = {}        # (node, command) -> captures sorted by capture time
+        self._times = {}        # (node, command) -> their "captured" strings, for bisect
+        self._node_keys = {}    # node -> [(node, command)]
+        self.blobs = {}         # digest -> (pack, offset, length)
+        self._index_pos = 0     # bytes of index.jsonl already loaded
+        self._maps = {}         # pack -> (file, mmap)
+        self._lock = threading.Lock()
+        self.refresh()
+
+    # ---------- index ----------
+    def refresh(self) -> list:
+        """Load index lines appended since the last call (by this or another process). Returns the new entries."""
+        new = []
+        if not os.path.exists(self.index_path):
+            return new
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            f.seek(self._index_pos)
+            while True:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    break  # missing or half-written last line, pick it up next time
+                self._index_pos = f.tell()
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.blobs.setdefault(entry["digest"], (entry["pack"], entry["offset"], entry["length"]))
+                self._add_entry(entry)
+                new.append(entry)
+        return new
+
+    def _add_entry(self, entry):
+        self.entries.append(entry)
+        key = (entry["node"], entry["command"])
+        times = self._times.get(key)
+        if times is None:
+            times = self._times[key] = []
+            self.by_key[key] = []
+            self._node_keys.setdefault(entry["node"], []).append(key)
+        # ISO strings of one format sort like the times; captures nearly always arrive in order
+        i = bisect.bisect_right(times, entry["captured"])
+        times.insert(i, entry["captured"])
+        self.by_key[key].insert(i, entry)
+
+    # ---------- write ----------
+    def store(self, node: str, command: str, text: str, captured=None) -> dict:
+        """Archive one command output and return its index entry."""
+        captured = _to_datetime(captured) or datetime.now()
+        raw = (text or "").encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        blob = zlib.compress(raw, COMPRESS_LEVEL)
+        # the thread lock covers this process, the file lock other processes appending to the same pack
+        with self._lock, _file_lock(self.lock_path):
+            self.refresh()
+            if digest not in self.blobs:
+                pack = f"pack-{captured.strftime('%Y%m')}.bin"
+                with open(os.path.join(self.pack_dir, pack), "ab") as pf:
+                    pf.seek(0, os.SEEK_END)
+                    offset = pf.tell()
+                    pf.write(blob)
+                self.blobs[digest] = (pack, offset, len(blob))
+            pack, offset, length = self.blobs[digest]
+            entry = {
+                "node": node,
+                "command": command,
+                "captured": captured.isoformat(timespec="seconds"),
+                "digest": digest,
+                "pack": pack,
+                "offset": offset,
+                "length": length,
+                "size": len(raw),
+            }
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                self._index_pos = f.tell()
+            self._add_entry(entry)
+        return entry
+
+    # ---------- read ----------
+    def _map(self, pack: str, end: int):
+        f, mm = self._maps.get(pack, (None, None))
+        if mm is None or len(mm) < end:
+            # first use, or the pack grew since it was mapped
+            if mm is not None:
+                mm.close()
+                f.close()
+            f = open(os.path.join(self.pack_dir, pack), "rb")
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack] = (f, mm)
+        return mm
+
+    def read(self, digest: str) -> str:
+        pack, offset, length = self.blobs[digest]
+        mm = self._map(pack, offset + length)
+        return zlib.decompress(mm[offset:offset + length]).decode("utf-8")
+
+    def find(self, node=None, command=None, since=None, until=None) -> list:
+        """
+        Index entries matching all given filters, oldest first.
+        `command` matches as a substring so "| i isis" finds the dated cpn_logs commands.
+        """
+        since, until = _to_datetime(since), _to_datetime(until)
+        keys = self._node_keys.get(node, []) if node else list(self.by_key)
+        runs = []
+        for key in keys:
+            if command and command not in key[1]:
+                continue
+            times = self._times[key]
+            lo = bisect.bisect_left(times, since.isoformat()) if since else 0
+            hi = bisect.bisect_right(times, until.isoformat()) if until else len(times)
+            if lo < hi:
+                runs.append(self.by_key[key][lo:hi])
+        if len(runs) == 1:
+            return runs[0]
+        return list(heapq.merge(*runs, key=lambda e: e["captured"]))
+
+    def nodes(self) -> list:
+        return list(self._node_keys)
+
+    def latest(self, node, command):
+        captures = self.by_key.get((node, command))
+        if captures:
+            return captures[-1]
+        found = self.find(node=node, command=command)
+        return found[-1] if found else None
+
+    def iter_outputs(self, **filters):
+        """Yield (entry, text) for every matching capture, oldest first."""
+        for e in self.find(**filters):
+            yield e, self.read(e["digest"])
+
+    def close(self):
+        for f, mm in self._maps.values():
+            mm.close()
+            f.close()
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ------------------------- CLI -------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Browse the raw device output archive")
+    ap.add_argument("--root", default=ARCHIVE_DIR, help=f"archive directory (default: {ARCHIVE_DIR})")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    for name in ("ls", "cat"):
+        p = sub.add_parser(name, help="list captures" if name == "ls" else "print captured output")
+        p.add_argument("--node")
+        p.add_argument("--command", help="substring of the device command")
+        p.add_argument("--since", help="ISO time, e.g. 2025-12-11 or 2025-12-11T14:00")
+        p.add_argument("--until", help="ISO time")
+        if name == "cat":
+            p.add_argument("--digest", help="print one blob by digest (prefix is enough)")
+    sub.add_parser("stats", help="archive size and dedup ratio")
+
+    args = ap.parse_args(argv)
+    with RawArchive(args.root) as arch:
+        if args.cmd == "stats":
+            raw = sum(e["size"] for e in arch.entries)
+            stored = sum(length for _, _, length in arch.blobs.values())
+            print(f"captures: {len(arch.entries)}  distinct outputs: {len(arch.blobs)}")
+            print(f"raw bytes: {raw}  stored bytes: {stored}  ratio: {raw / stored if stored else 0:.1f}x")
+            return
+        if args.cmd == "cat" and args.digest:
+            matches = [d for d in arch.blobs if d.startswith(args.digest)]
+            if len(matches) != 1:
+                sys.exit(f"digest '{args.digest}' matches {len(matches)} blobs")
+            sys.stdout.write(arch.read(matches[0]))
+            return
+        entries = arch.find(node=args.node, command=args.command, since=args.since, until=args.until)
+        for e in entries:
+            if args.cmd == "ls":
+                print(f"{e['captured']}  {e['node']:<20} {e['digest'][:12]}  {e['size']:>9}  {e['command']}")
+            else:
+                print(f"===== {e['node']} | {e['command']} | {e['captured']} =====")
+                sys.stdout.write(arch.read(e["digest"]) + "\n")
+
+
+if __name__ == "__main__":
+    main()
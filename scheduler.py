@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# scheduler.py
+# Adaptive per-node polling for the collectors' --watch mode (stdlib only)
+#
+# Every node keeps its own polling interval:
+#   - a poll that finds new SESSION_STATE_DOWN / ADJCHANGE Down events shrinks it (down to --min-interval)
+#   - a quiet poll grows it (up to --max-interval)
+# Due times get random jitter so nodes do not line up, and at most --concurrency
+# SSH sessions run at the same time.
+
+import heapq
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from log_parsers import parse_events
+
+# ------------------------- CONFIG -------------------------
+MIN_INTERVAL = 60        # seconds, busiest a flapping node gets polled
+BASE_INTERVAL = 300      # first interval after the initial poll
+MAX_INTERVAL = 1800      # quietest a node gets
+SHRINK = 0.5             # interval factor after a troubled poll
+GROW = 1.5               # interval factor after a quiet poll
+JITTER = 0.1             # +/- fraction applied to every interval
+CONCURRENCY = 2          # SSH sessions at once
+
+
+def add_watch_args(ap):
+    """Shared --watch options for BGP.py and cpn_logs.py."""
+    ap.add_argument("--watch", action="store_true",
+                    help="keep polling with adaptive per-node intervals until Ctrl+C")
+    ap.add_argument("--min-interval", type=int, default=MIN_INTERVAL,
+                    help=f"watch: shortest polling interval in seconds (default: {MIN_INTERVAL})")
+    ap.add_argument("--max-interval", type=int, default=MAX_INTERVAL,
+                    help=f"watch: longest polling interval in seconds (default: {MAX_INTERVAL})")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                    help=f"watch: SSH sessions at the same time (default: {CONCURRENCY})")
+
+
+def new_down_events(node: str, text: str, last_seen: dict, year: int = None) -> int:
+    """
+    Count Down events (ISIS ADJCHANGE or BFD SESSION_STATE) newer than the last
+    event seen for this node on a previous poll, then remember the newest one.
+    """
+    year = year or datetime.now().year
+    previous = last_seen.get(node)
+    newest = previous
+    count = 0
+    for ev in parse_events(node, text, year):
+        if previous is not None and ev["time"] <= previous:
+            continue
+        if ev["state"] == "Down":
+            count += 1
+        if newest is None or ev["time"] > newest:
+            newest = ev["time"]
+    if newest is not None:
+        last_seen[node] = newest
+    return count
+
+
+def new_event_interfaces(node: str, text: str, last_seen: dict, year: int = None) -> set:
+    """
+    Interfaces with an event newer than the last one seen for this node. Call before
+    new_down_events() so --watch appends only rows that changed since the previous poll.
+    """
+    year = year or datetime.now().year
+    previous = last_seen.get(node)
+    return {ev["interface"] for ev in parse_events(node, text, year)
+            if previous is None or ev["time"] > previous}
+
+
+class AdaptiveScheduler:
+    """
+    poll_fn(node) does one full collection for the node and returns the number of
+    new Down events it saw (None if the poll failed; the interval is then kept).
+    """
+
+    def __init__(self, nodes, poll_fn, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 base_interval=BASE_INTERVAL, concurrency=CONCURRENCY, jitter=JITTER, log_fn=print):
+        self.poll_fn = poll_fn
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.base_interval = min(max(base_interval, self.min_interval), self.max_interval)
+        self.concurrency = max(1, concurrency)
+        self.jitter = jitter
+        self.log = log_fn
+        # node -> {interval, polls, downs, last_poll}
+        self.state = {n: {"interval": self.base_interval, "polls": 0, "downs": 0, "last_poll": None} for n in nodes}
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def record(self, node: str, downs) -> float:
+        """Adapt the node's interval to its last poll result and return the delay until its next poll."""
+        st = self.state[node]
+        st["polls"] += 1
+        st["last_poll"] = datetime.now()
+        if downs is not None:
+            st["downs"] += downs
+            factor = SHRINK if downs > 0 else GROW
+            st["interval"] = min(self.max_interval, max(self.min_interval, st["interval"] * factor))
+        return self._jittered(st["interval"])
+
+    def run(self, max_polls: int = None):
+        """
+        Poll until Ctrl+C (or max_polls polls in total). Every node is polled once
+        at start-up, then only when its own interval is due.
+        """
+        now = time.monotonic()
+        # spread the first round a little so the first sessions do not all open in the same second
+        due = [(now + random.uniform(0, self.jitter * self.min_interval), n) for n in self.state]
+        heapq.heapify(due)
+        total = 0
+        running = {}  # future -> node
+        pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            while max_polls is None or total < max_polls or running:
+                now = time.monotonic()
+                while due and due[0][0] <= now and len(running) < self.concurrency \
+                        and (max_polls is None or total + len(running) < max_polls):
+                    _, node = heapq.heappop(due)
+                    running[pool.submit(self.poll_fn, node)] = node
+
+                timeout = max(0.0, due[0][0] - now) if due else None
+                if not running:
+                    if timeout is None or (max_polls is not None and total >= max_polls):
+                        break
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(running, timeout=timeout if len(running) < self.concurrency else None,
+                               return_when=FIRST_COMPLETED)
+                for fut in done:
+                    node = running.pop(fut)
+                    try:
+                        downs = fut.result()
+                    except Exception as e:
+                        self.log(f"{node} - WATCH POLL ERROR: {e}")
+                        downs = None
+                    total += 1
+                    delay = self.record(node, downs)
+                    heapq.heappush(due, (time.monotonic() + delay, node))
+                    result = "poll failed" if downs is None else f"{downs} new down events"
+                    self.log(f"{node} - {result}, next poll in {delay:.0f}s")
+        except KeyboardInterrupt:
+            self.log("Watch stopped, waiting for running polls")
+        finally:
+            pool.shutdown(wait=True)
+        return total
+
+    def summary(self) -> str:
+        lines = [f"{'Node':<22}{'Polls':>7}{'Downs':>7}{'Interval(s)':>13}"]
+        for node, st in self.state.items():
+            lines.append(f"{node:<22}{st['polls']:>7}{st['downs']:>7}{st['interval']:>13.0f}")
+        return "\n".join(lines)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# tracing.py
+# Stage-level tracing spans with opt-in cProfile / tracemalloc capture (stdlib only)
+#
+#   from tracing import span
+#   with span("ssh_connect"):
+#       conn = ConnectHandler(**device)
+#
+# Spans are always timed (a few microseconds each) and nest per thread, so every stage
+# is reported under its parents, e.g. fetch;send_command. With --profile, spans on the
+# main thread of each process (this process' writer, the parse worker processes) run that
+# stage's cProfile profiler and record the tracemalloc delta. Only one profiler is active
+# per process at any time (Python 3.12+ allows no more): the parent span's profiler is
+# paused meanwhile, so a stage's profile holds only its own work. tracemalloc counts the
+# whole process, so spans in other threads (SSH fetches) are timed but neither profiled
+# nor given a memory figure ("-" in Mem(KB)). The run then writes
+#   <dir>/summary.txt      stage table, top functions per stage, top allocation sites
+#   <dir>/stacks.folded    span self-times in folded-stack format (flamegraph.pl, speedscope)
+#   <dir>/<stage>.prof     pstats per stage (snakeviz, python -m pstats)
+
+import argparse
+import cProfile
+import glob
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# ------------------------- CONFIG -------------------------
+PROFILE_DIR_TEMPLATE = "profile-{ts}"
+TOP_FUNCTIONS = 15       # per stage in summary.txt
+TOP_ALLOCATIONS = 20
+
+
+def add_profile_args(ap):
+    """Shared --profile option for the collectors."""
+    ap.add_argument("--profile", nargs="?", const="", default=None, metavar="DIR",
+                    help="capture cProfile/tracemalloc per stage and write a summary and "
+                         "flamegraph stacks (default dir: profile-<timestamp>)")
+
+
+class Tracer:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {}           # span path tuple -> {count, total, self, max, mem (None: not measured)}
+        self.profile_dir = None
+        self._profiles = {}       # stage -> cProfile.Profile (main thread only)
+        self._profile_error = None
+
+    @property
+    def profiling(self) -> bool:
+        return self.profile_dir is not None
+
+    def enable_profiling(self, profile_dir=None, parent="."):
+        """Turn on per-span cProfile/tracemalloc; without profile_dir a profile-<ts> dir under parent is used."""
+        if not profile_dir:
+            profile_dir = os.path.join(parent, PROFILE_DIR_TEMPLATE.format(ts=datetime.now().strftime("%Y%m%d-%H%M%S")))
+        os.makedirs(profile_dir, exist_ok=True)
+        self.profile_dir = profile_dir
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return profile_dir
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+    def reset_process(self):
+        """Drop span stats, profilers and locks inherited from the parent by a forked worker."""
+        for prof in self._profiles.values():
+            try:
+                prof.disable()
+            except Exception:
+                pass
+        self._profiles = {}
+        self._local = threading.local()
+        # the parent may have forked while another thread held the lock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enable(self, prof):
+        """Start prof; on failure (e.g. another profiler is active) warn once and go on unprofiled."""
+        try:
+            prof.enable()
+            return prof
+        except Exception as e:
+            if self._profile_error is None:
+                self._profile_error = str(e)
+                print(f"--profile: cProfile unavailable ({e}); spans are timed but not profiled", file=sys.stderr)
+            return None
+
+    @contextmanager
+    def span(self, name: str):
+        # name doubles as a file name for the stage's .prof, keep it to [A-Za-z0-9_]
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        frame = {"name": name, "child": 0.0, "prof": None}
+        measure = self.profile_dir is not None and threading.current_thread() is threading.main_thread()
+        mem0 = 0
+        if measure:
+            mem0 = tracemalloc.get_traced_memory()[0]
+            if parent and parent["prof"]:
+                parent["prof"].disable()
+            prof = self._profiles.get(name)
+            if prof is None:
+                prof = self._profiles[name] = cProfile.Profile()
+            frame["prof"] = self._enable(prof)
+        stack.append(frame)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - t0
+            mem = None
+            if measure:
+                mem = tracemalloc.get_traced_memory()[0] - mem0
+                if frame["prof"]:
+                    frame["prof"].disable()
+                if parent and parent["prof"]:
+                    parent["prof"] = self._enable(parent["prof"])
+            stack.pop()
+            if parent:
+                parent["child"] += duration
+            path = tuple(f["name"] for f in stack) + (name,)
+            self._add(path, 1, duration, duration - frame["child"], duration, mem)
+
+    def _add(self, path, count, total, self_time, max_time, mem):
+        with self._lock:
+            st = self.stats.get(path)
+            if st is None:
+                st = self.stats[path] = {"count": 0, "total": 0.0, "self": 0.0, "max": 0.0, "mem": None}
+            st["count"] += count
+            st["total"] += total
+            st["self"] += self_time
+            st["max"] = max(st["max"], max_time)
+            if mem is not None:
+                st["mem"] = (st["mem"] or 0) + mem
+
+    # ---------- worker processes ----------
+    def export(self) -> dict:
+        with self._lock:
+            return {path: dict(st) for path, st in self.stats.items()}
+
+    def merge(self, exported: dict, prefix=()):
+        """Add span stats collected elsewhere (a worker process) under prefix."""
+        for path, st in (exported or {}).items():
+            self._add(tuple(prefix) + tuple(path), st["count"], st["total"], st["self"], st["max"], st["mem"])
+
+    def _collected(self):
+        """stage -> profiler, leaving out profilers that never ran."""
+        out = {}
+        for name, prof in list(self._profiles.items()):
+            prof.create_stats()
+            if prof.stats:
+                out[name] = prof
+        return out
+
+    def dump_worker_profiles(self):
+        for name, prof in self._collected().items():
+            prof.dump_stats(os.path.join(self.profile_dir, f"worker-{os.getpid()}-{name}.prof"))
+
+    # ---------- reports ----------
+    def summary(self) -> str:
+        lines = [f"{'Stage':<48}{'Count':>7}{'Total(s)':>10}{'Self(s)':>10}{'Mean(ms)':>10}{'Max(ms)':>10}"
+                 + (f"{'Mem(KB)':>10}" if self.profiling else "")]
+        for path, st in sorted(self.export().items()):
+            label = "  " * (len(path) - 1) + path[-1]
+            line = (f"{label:<48}{st['count']:>7}{st['total']:>10.3f}{st['self']:>10.3f}"
+                    f"{st['total'] / st['count'] * 1000:>10.2f}{st['max'] * 1000:>10.2f}")
+            if self.profiling:
+                line += f"{st['mem'] / 1024:>10.1f}" if st["mem"] is not None else f"{'-':>10}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def write_report(self) -> str:
+        """Write summary.txt, stacks.folded and one .prof per stage; returns the directory."""
+        d = self.profile_dir
+        with open(os.path.join(d, "stacks.folded"), "w", encoding="utf-8") as f:
+            for path, st in sorted(self.export().items()):
+                us = int(st["self"] * 1_000_000)
+                if us > 0:
+                    f.write(f"{';'.join(path)} {us}\n")
+
+        by_stage = self._collected()
+        worker_files = glob.glob(os.path.join(d, "worker-*.prof"))
+        stage_names = set(by_stage) | {os.path.basename(p).split("-", 2)[2][:-5] for p in worker_files}
+
+        out = io.StringIO()
+        out.write(f"Profile - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        if self._profile_error:
+            out.write(f"cProfile unavailable in this process: {self._profile_error}\n\n")
+        out.write(self.summary() + "\n")
+        for name in sorted(stage_names):
+            stats = pstats.Stats(by_stage[name], stream=out) if name in by_stage else None
+            for path in glob.glob(os.path.join(d, f"worker-*-{name}.prof")):
+                stats = pstats.Stats(path, stream=out) if stats is None else stats.add(path)
+            if stats is None or not stats.stats:
+                continue
+            stats.dump_stats(os.path.join(d, f"{name}.prof"))
+            out.write(f"\n===== {name}: top {TOP_FUNCTIONS} functions by own time =====\n")
+            stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            out.write(f"\n===== memory: current {current / 1024:.0f} KB, peak {peak / 1024:.0f} KB "
+                      f"(main process); top {TOP_ALLOCATIONS} allocation sites =====\n")
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]:
+                out.write(f"{stat}\n")
+
+        with open(os.path.join(d, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        return d
+
+
+# one tracer per process
+TRACER = Tracer()
+span = TRACER.span
+
+
+def init_worker(profile_dir):
+    """ProcessPoolExecutor initializer: carry --profile into the worker processes."""
+    # a forked worker inherits the parent's spans and (possibly running) profilers
+    TRACER.reset_process()
+    if profile_dir:
+        TRACER.enable_profiling(profile_dir)
+
+def run_in_worker(stage, fn, *args):
+    """
+    Run fn(*args) in a worker process under a `stage` span and return
+    (result, seconds, span stats) so the parent can merge the worker's spans.
+    """
+    TRACER.reset()
+    t0 = time.perf_counter()
+    with span(stage):
+        result = fn(*args)
+    seconds = time.perf_counter() - t0
+    if TRACER.profiling:
+        TRACER.dump_worker_profiles()
+    return result, seconds, TRACER.export()
+
+def finish_tracing(log_fn=print):
+    """End of a run: print the stage table, and write the profile report when --profile is on."""
+    log_fn("Stage timings\n" + TRACER.summary())
+    if TRACER.profiling:
+        d = TRACER.write_report()
+        log_fn(f"Profile written to {d}/ (summary.txt, stacks.folded, <stage>.prof)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Print a saved profile summary")
+    ap.add_argument("dir", help="profile directory written by --profile")
+    args = ap.parse_args(argv)
+    with open(os.path.join(args.dir, "summary.txt"), encoding="utf-8") as f:
+        print(f.read())
+
+
+if __name__ == "__main__":
+    main()